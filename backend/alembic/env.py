@@ -1,7 +1,7 @@
 from logging.config import fileConfig
 
 from alembic import context
-from sqlalchemy import engine_from_config, pool
+from sqlalchemy import engine_from_config, func, pool, select
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -69,8 +69,17 @@ def run_migrations_online():
     )
 
     with connectable.connect() as connection:
+        # DDL waiting on a lock blocks every query queued behind it, so give up
+        # instead; see app/core/migrations.py for changes to large tables
+        lock_timeout = f"{settings().MIGRATION_LOCK_TIMEOUT_SECONDS * 1000:.0f}ms"
+        connection.execute(select(func.set_config("lock_timeout", lock_timeout, False)))
+        connection.commit()
+
         context.configure(
-            connection=connection, target_metadata=target_metadata, compare_type=True
+            connection=connection,
+            target_metadata=target_metadata,
+            compare_type=True,
+            transaction_per_migration=True,
         )
 
         with context.begin_transaction():
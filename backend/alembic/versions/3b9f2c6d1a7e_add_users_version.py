@@ -0,0 +1,27 @@
+"""add users version
+
+Revision ID: 3b9f2c6d1a7e
+Revises: e4f8353f11e4
+Create Date: 2026-10-17 09:12:31.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9f2c6d1a7e'
+down_revision = 'e4f8353f11e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "users",
+        sa.Column("version", sa.Integer(), nullable = False, server_default = "1")
+    )
+
+
+def downgrade():
+    op.drop_column("users", "version")
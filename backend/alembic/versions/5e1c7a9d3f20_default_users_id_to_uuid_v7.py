@@ -0,0 +1,47 @@
+"""default users id to uuid v7
+
+Existing users keep their random (version 4) IDs, since those are referenced
+by issued tokens and other systems; only new rows get time-ordered ones.
+
+Revision ID: 5e1c7a9d3f20
+Revises: a7d3e9c2b4f1
+Create Date: 2026-10-17 18:03:27.551904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e1c7a9d3f20'
+down_revision = 'a7d3e9c2b4f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Postgres 12 has no gen_random_uuid() without pgcrypto, so the random
+    # bits come from md5 over random() and the clock
+    op.execute(
+        """
+        CREATE FUNCTION uuid_generate_v7() RETURNS uuid AS $$
+        DECLARE
+            unix_ms bigint := floor(extract(epoch FROM clock_timestamp()) * 1000);
+            bytes bytea := decode(md5(random()::text || clock_timestamp()::text), 'hex');
+        BEGIN
+            bytes := overlay(bytes PLACING substring(int8send(unix_ms) FROM 3) FROM 1 FOR 6);
+            bytes := set_byte(bytes, 6, (b'0111' || get_byte(bytes, 6)::bit(4))::bit(8)::int);
+            bytes := set_byte(bytes, 8, (b'10' || get_byte(bytes, 8)::bit(6))::bit(8)::int);
+            RETURN encode(bytes, 'hex')::uuid;
+        END
+        $$ LANGUAGE plpgsql VOLATILE
+        """
+    )
+    op.alter_column(
+        "users", "id", server_default = sa.text("uuid_generate_v7()")
+    )
+
+
+def downgrade():
+    op.alter_column("users", "id", server_default = None)
+    op.execute("DROP FUNCTION uuid_generate_v7()")
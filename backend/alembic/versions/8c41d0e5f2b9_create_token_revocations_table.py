@@ -0,0 +1,37 @@
+"""create token revocations table
+
+Revision ID: 8c41d0e5f2b9
+Revises: 3b9f2c6d1a7e
+Create Date: 2026-10-17 11:40:05.731290
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c41d0e5f2b9'
+down_revision = '3b9f2c6d1a7e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "token_revocations",
+        sa.Column("id", sa.BigInteger(), sa.Identity(), primary_key = True),
+        sa.Column("jti", sa.UUID(), nullable = True),
+        sa.Column("user_id", sa.UUID(), nullable = True),
+        sa.Column("revoked_at", sa.DateTime(timezone = True), nullable = False),
+        sa.Column("expires_at", sa.DateTime(timezone = True), nullable = False)
+    )
+    op.create_index(
+        "ix_token_revocations_revoked_at", "token_revocations", ["revoked_at"]
+    )
+    op.create_index(
+        "ix_token_revocations_user_id", "token_revocations", ["user_id"]
+    )
+
+
+def downgrade():
+    op.drop_table("token_revocations")
@@ -0,0 +1,52 @@
+"""index users by lower email
+
+Replaces the case-sensitive unique index on email with a unique index on
+lower(email) that includes what a login reads, so logins are index-only
+scans and addresses that differ only in case can no longer both register.
+
+Revision ID: 9d2b6f4e8a13
+Revises: 5e1c7a9d3f20
+Create Date: 2026-10-17 18:41:09.316752
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.core import migrations
+
+
+# revision identifiers, used by Alembic.
+revision = '9d2b6f4e8a13'
+down_revision = '5e1c7a9d3f20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    duplicates = op.get_bind().execute(
+        sa.text(
+            "SELECT lower(email) FROM users GROUP BY lower(email) HAVING count(*) > 1"
+        )
+    ).scalars().all()
+
+    if duplicates:
+        raise RuntimeError(
+            "Merge or rename the users sharing these emails before upgrading: "
+            + ", ".join(duplicates)
+        )
+
+    migrations.create_index_concurrently(
+        "ix_users_lower_email",
+        "users",
+        [sa.text("lower(email)")],
+        unique = True,
+        postgresql_include = ["email", "id", "hashed_password"]
+    )
+    migrations.drop_index_concurrently("email_index", "users")
+
+
+def downgrade():
+    migrations.create_index_concurrently(
+        "email_index", "users", ["email"], unique = True
+    )
+    migrations.drop_index_concurrently("ix_users_lower_email", "users")
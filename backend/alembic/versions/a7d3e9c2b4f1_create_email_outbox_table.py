@@ -0,0 +1,45 @@
+"""create email outbox table
+
+Revision ID: a7d3e9c2b4f1
+Revises: 8c41d0e5f2b9
+Create Date: 2026-10-17 17:12:48.209316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d3e9c2b4f1'
+down_revision = '8c41d0e5f2b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "email_outbox",
+        sa.Column("id", sa.BigInteger(), sa.Identity(), primary_key = True),
+        sa.Column("email_to", sa.String(length = 255), nullable = False),
+        sa.Column("subject", sa.String(), nullable = False),
+        sa.Column("html_content", sa.Text(), nullable = False),
+        sa.Column(
+            "available_at",
+            sa.DateTime(timezone = True),
+            server_default = sa.func.now(),
+            nullable = False
+        ),
+        sa.Column("attempts", sa.Integer(), nullable = False),
+        sa.Column("last_error", sa.Text(), nullable = True),
+        sa.Column("dead_at", sa.DateTime(timezone = True), nullable = True)
+    )
+    op.create_index(
+        "ix_email_outbox_available_at",
+        "email_outbox",
+        ["available_at"],
+        postgresql_where = sa.text("dead_at IS NULL")
+    )
+
+
+def downgrade():
+    op.drop_table("email_outbox")
@@ -0,0 +1,67 @@
+"""create sessions table
+
+Hourly wind observations are kept as arrays on each session rather than in a
+table of their own, so a session costs one row and one index entry.
+
+Revision ID: c6a8e2f05b71
+Revises: 9d2b6f4e8a13
+Create Date: 2026-10-17 19:22:40.518307
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6a8e2f05b71'
+down_revision = '9d2b6f4e8a13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "sessions",
+        sa.Column(
+            "id",
+            sa.Uuid(),
+            server_default = sa.text("uuid_generate_v7()"),
+            primary_key = True
+        ),
+        sa.Column(
+            "user_id",
+            sa.Uuid(),
+            sa.ForeignKey("users.id", ondelete = "CASCADE"),
+            nullable = False
+        ),
+        sa.Column("date", sa.Date(), nullable = False),
+        sa.Column("start_time", sa.Time(), nullable = False),
+        sa.Column("end_time", sa.Time(), nullable = False),
+        sa.Column("location", sa.String(length = 255), nullable = False),
+        sa.Column(
+            "sport",
+            sa.Enum("windsurfing", "wingfoiling", name = "sport"),
+            nullable = False
+        ),
+        sa.Column("equipment", sa.String(length = 255), nullable = False),
+        sa.Column(
+            "power_level",
+            sa.Enum("underpowered", "wellpowered", "overpowered", name = "power_level"),
+            nullable = False
+        ),
+        sa.Column("average_speed_kts", postgresql.ARRAY(sa.REAL()), nullable = False),
+        sa.Column("gust_speed_kts", postgresql.ARRAY(sa.REAL()), nullable = False),
+        sa.Column(
+            "direction_degrees", postgresql.ARRAY(sa.SmallInteger()), nullable = False
+        )
+    )
+    op.create_index(
+        "ix_sessions_user_id_date", "sessions", ["user_id", "date", "id"]
+    )
+
+
+def downgrade():
+    op.drop_table("sessions")
+    op.execute("DROP TYPE power_level")
+    op.execute("DROP TYPE sport")
@@ -1,10 +1,20 @@
-from fastapi import FastAPI, HTTPException, Request
+import asyncio
+import math
+import signal
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any, cast
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.routing import APIRoute
 from starlette.middleware.cors import CORSMiddleware
+from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
 
+from app.api.middleware import QueryTimingMiddleware
 from app.api.routes import api_router
-from app.core import config
-from app.core.exceptions import Unauthorized
+from app.core import config, db, emails, outbox, revocations, security
+from app.core.exceptions import Overloaded, RateLimited, Unauthorized
 
 
 def custom_generate_unique_id(route: APIRoute) -> str:
@@ -18,18 +28,58 @@ def custom_generate_unique_id(route: APIRoute) -> str:
 _settings = config.settings()
 
 
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGHUP, config.reload)
+    db.engine()
+    emails.load_templates()
+    tasks = [asyncio.create_task(revocations.refresh_periodically())]
+    if _settings.emails_enabled:
+        tasks += [
+            asyncio.create_task(outbox.deliver_periodically())
+            for _ in range(_settings.OUTBOX_WORKERS)
+        ]
+    yield
+    for task in tasks:
+        task.cancel()
+    loop.remove_signal_handler(signal.SIGHUP)
+    security.shutdown_hashing_pool()
+    await emails.close_smtp_pool()
+    await db.dispose()
+
+
 app = FastAPI(
     title=_settings.PROJECT_NAME,
     openapi_url=f"{_settings.API_V1_STR}/openapi.json",
     generate_unique_id_function=custom_generate_unique_id,
+    lifespan=lifespan,
 )
 
 
 @app.exception_handler(Unauthorized)
-async def unauthorized_exception_handler(_: Request, __: Unauthorized):
-    return HTTPException(status_code=403)
+async def unauthorized_exception_handler(_: Request, __: Unauthorized) -> JSONResponse:
+    return JSONResponse(status_code=403, content={"detail": "Forbidden"})
+
+
+@app.exception_handler(Overloaded)
+async def overloaded_exception_handler(_: Request, e: Overloaded) -> JSONResponse:
+    return JSONResponse(
+        status_code=503, content={"detail": str(e)}, headers={"Retry-After": "1"}
+    )
+
+
+@app.exception_handler(RateLimited)
+async def rate_limited_exception_handler(_: Request, e: RateLimited) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(e)},
+        headers={"Retry-After": str(math.ceil(e.retry_after))},
+    )
 
 
+app.add_middleware(QueryTimingMiddleware)
+
 if _settings.all_cors_origins:
     app.add_middleware(
         CORSMiddleware,
@@ -40,4 +90,14 @@ if _settings.all_cors_origins:
     )
 
 
+# Added last so that it runs first, and everything after it, such as login
+# throttling, sees the client's address instead of the proxy's
+if _settings.TRUSTED_PROXIES:
+    # uvicorn types ASGI applications more narrowly than Starlette, though the
+    # middleware works with any
+    app.add_middleware(
+        cast(Any, ProxyHeadersMiddleware), trusted_hosts=_settings.TRUSTED_PROXIES
+    )
+
+
 app.include_router(api_router, prefix=_settings.API_V1_STR)
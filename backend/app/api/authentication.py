@@ -1,10 +1,11 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.security import OAuth2PasswordRequestForm
+from jwt.exceptions import InvalidTokenError
 from pydantic import BaseModel, Field
 
-from app.api.deps import DatabaseSession
+from app.api.deps import AccessToken, CurrentPrincipal, DatabaseSession
 from app.api.models import Message
 from app.core import config, users
 from app.core.exceptions import DoesNotExist, Unauthorized
@@ -13,6 +14,10 @@ router = APIRouter(tags=["authentication"])
 settings = config.settings()
 
 
+class RefreshToken(BaseModel):
+    refresh_token: str
+
+
 class ResetPassword(BaseModel):
     token: str
     password: str = Field(min_length=8, max_length=40)
@@ -20,21 +25,29 @@ class ResetPassword(BaseModel):
 
 class Token(BaseModel):
     access_token: str
+    refresh_token: str | None = None
     token_type: str = "bearer"
 
 
 @router.post(settings.LOGIN_ENDPOINT)
 async def login(
-    session: DatabaseSession, form_data: Annotated[OAuth2PasswordRequestForm, Depends()]
+    request: Request,
+    session: DatabaseSession,
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
 ) -> Token:
     """
     Exchange a username and password for an access token.
     """
     try:
-        access_token = await users.create_token(
-            session, email=form_data.username, password=form_data.password
+        tokens = await users.create_token(
+            session,
+            email=form_data.username,
+            password=form_data.password,
+            client=request.client.host if request.client else None,
+        )
+        return Token(
+            access_token=tokens.access_token, refresh_token=tokens.refresh_token
         )
-        return Token(access_token=access_token)
     except (DoesNotExist, Unauthorized):
         raise HTTPException(
             status_code=401,
@@ -42,6 +55,44 @@ async def login(
         )
 
 
+@router.post(settings.REFRESH_TOKEN_ENDPOINT)
+async def refresh(session: DatabaseSession, body: RefreshToken) -> Token:
+    """
+    Exchange a refresh token for new tokens carrying the user's current details.
+    """
+    try:
+        tokens = await users.refresh_tokens(session, body.refresh_token)
+        return Token(
+            access_token=tokens.access_token, refresh_token=tokens.refresh_token
+        )
+    except (InvalidTokenError, KeyError, ValueError, DoesNotExist, Unauthorized):
+        raise HTTPException(status_code=401)
+
+
+@router.post("/logout")
+async def logout(session: DatabaseSession, token: AccessToken) -> Message:
+    """
+    Revoke the access token used to make this request.
+    """
+    try:
+        await users.logout(session, token)
+    except (InvalidTokenError, KeyError, ValueError):
+        raise HTTPException(status_code=401)
+
+    return Message(message="Logged out")
+
+
+@router.post("/logout-everywhere")
+async def logout_everywhere(
+    session: DatabaseSession, current_user: CurrentPrincipal
+) -> Message:
+    """
+    Revoke every token issued to the current user so far.
+    """
+    await users.logout_everywhere(session, current_user)
+    return Message(message="Logged out everywhere")
+
+
 @router.post("/password-recovery/{email}")
 async def recover_password(session: DatabaseSession, email: str) -> Message:
     """
@@ -1,6 +1,6 @@
 from typing import Annotated
 
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Request
 from fastapi.security import OAuth2PasswordBearer
 from jwt.exceptions import InvalidTokenError
 from pydantic import BaseModel
@@ -15,12 +15,17 @@ _reusable_oauth2 = OAuth2PasswordBearer(
 )
 
 
-async def get_db():
-    async with db.get_session() as session:
+async def get_db(request: Request):
+    # Reads made while handling anything but a safe request go to the primary,
+    # so that they observe the request's own writes
+    pin_to_primary = request.method not in ("GET", "HEAD")
+    async with db.get_session(pin_to_primary=pin_to_primary) as session:
         yield session
+        await session.commit()
 
 
 DatabaseSession = Annotated[AsyncSession, Depends(get_db)]
+AccessToken = Annotated[str, Depends(_reusable_oauth2)]
 
 
 class TokenPayload(BaseModel):
@@ -28,8 +33,8 @@ class TokenPayload(BaseModel):
 
 
 async def get_current_user(
-    session: DatabaseSession, token: Annotated[str, Depends(_reusable_oauth2)]
-) -> users.User:
+    session: DatabaseSession, token: AccessToken
+) -> users.Principal:
     try:
         return await users.get_from_token(session, token)
     except (InvalidTokenError, ValueError):
@@ -38,4 +43,19 @@ async def get_current_user(
         raise HTTPException(status_code=404, detail="User not found")
 
 
-CurrentUser = Annotated[users.User, Depends(get_current_user)]
+# Always read from the database, or the principal cache, rather than claims
+CurrentUser = Annotated[users.Principal, Depends(get_current_user)]
+
+
+async def get_current_principal(
+    session: DatabaseSession, token: AccessToken
+) -> users.Principal:
+    try:
+        return await users.get_principal_from_token(session, token)
+    except (InvalidTokenError, KeyError, ValueError):
+        raise HTTPException(status_code=401)
+    except DoesNotExist:
+        raise HTTPException(status_code=404, detail="User not found")
+
+
+CurrentPrincipal = Annotated[users.Principal, Depends(get_current_principal)]
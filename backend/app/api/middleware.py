@@ -0,0 +1,71 @@
+import logging
+import time
+
+from fastapi.routing import APIRoute
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import config, db
+
+logger = logging.getLogger(__name__)
+
+
+def _route_id(scope: Scope) -> str:
+    # Set by FastAPI once the request has been matched to a route
+    route = scope.get("route")
+    return route.unique_id if isinstance(route, APIRoute) else "unmatched"
+
+
+class QueryTimingMiddleware:
+    """
+    Reports the statements each request executed and the time it spent on the
+    database in a Server-Timing header, and optionally in a log line.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        settings = config.settings()
+        started_at = time.perf_counter()
+
+        with db.track_queries() as stats:
+
+            async def send_with_timing(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    if settings.SERVER_TIMING_ENABLED:
+                        headers = MutableHeaders(scope=message)
+                        headers.append(
+                            "Server-Timing",
+                            f'db;dur={stats.query_seconds * 1000:.1f};desc="{stats.queries} queries", '
+                            f"pool;dur={stats.pool_wait_seconds * 1000:.1f}, "
+                            f"app;dur={(time.perf_counter() - started_at) * 1000:.1f}",
+                        )
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                self._log(scope, stats, time.perf_counter() - started_at)
+
+    def _log(self, scope: Scope, stats: db.QueryStats, elapsed: float) -> None:
+        settings = config.settings()
+        too_many = stats.queries > settings.QUERY_COUNT_WARNING_THRESHOLD
+
+        if not (too_many or settings.REQUEST_LOG_ENABLED):
+            return
+
+        logger.log(
+            logging.WARNING if too_many else logging.INFO,
+            "route=%s method=%s queries=%d db_ms=%.1f pool_ms=%.1f total_ms=%.1f",
+            _route_id(scope),
+            scope["method"],
+            stats.queries,
+            stats.query_seconds * 1000,
+            stats.pool_wait_seconds * 1000,
+            elapsed * 1000,
+        )
@@ -1,10 +1,18 @@
 from pydantic import BaseModel
 
+from app.core import cache, db, security
+
 
 class Message(BaseModel):
     message: str
 
 
+class Metrics(BaseModel):
+    password_hashing: security.HashingPoolStats
+    principal_cache: cache.CacheStats
+    database_pool: db.PoolStats
+
+
 class PageParams(BaseModel):
     count: int
-    cursor: str | None
+    cursor: str | None = None
@@ -1,6 +1,10 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 
-from app.api import authentication, users
+from app.api import authentication, sessions, users
+from app.api.deps import CurrentPrincipal
+from app.api.models import Metrics
+from app.core import db, security
+from app.core.users import principal_cache_stats
 
 api_router = APIRouter()
 
@@ -10,5 +14,23 @@ async def health() -> bool:
     return True
 
 
+@api_router.get("/metrics")
+async def metrics(current_user: CurrentPrincipal) -> Metrics:
+    """
+    Report worker-local resource usage.
+
+    Accessible only to administrators.
+    """
+    if not current_user.admin:
+        raise HTTPException(status_code=403)
+
+    return Metrics(
+        password_hashing=security.hashing_pool_stats(),
+        principal_cache=principal_cache_stats(),
+        database_pool=db.pool_stats(),
+    )
+
+
 api_router.include_router(authentication.router)
 api_router.include_router(users.router)
+api_router.include_router(sessions.router)
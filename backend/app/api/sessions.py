@@ -0,0 +1,127 @@
+import datetime
+import uuid
+from typing import Annotated, Self
+
+import pydantic as pyd
+from fastapi import APIRouter, Body, HTTPException, Query
+
+from app.api.deps import CurrentPrincipal, CurrentUser, DatabaseSession
+from app.api.models import PageParams
+from app.core import config, db, sessions, wind_statistics
+
+router = APIRouter(prefix="/sessions", tags=["sessions"])
+
+
+class WindObservation(pyd.BaseModel):
+    average_speed_kts: float | None = pyd.Field(default=None, ge=0)
+    gust_speed_kts: float | None = pyd.Field(default=None, ge=0)
+    direction_degrees: int | None = pyd.Field(default=None, ge=0, lt=360)
+
+
+class SessionCreate(pyd.BaseModel):
+    date: datetime.date
+    start_time: datetime.time
+    end_time: datetime.time
+    location: str = pyd.Field(max_length=255)
+    sport: sessions.Sport
+    equipment: str = pyd.Field(max_length=255)
+    power_level: sessions.PowerLevel
+    # One per hour, starting with the hour the session started in
+    observations: list[WindObservation] = pyd.Field(default=[], max_length=24)
+
+    @pyd.model_validator(mode="after")
+    def check_times(self) -> Self:
+        if self.end_time < self.start_time:
+            raise ValueError("The session must end after it starts")
+        if len(self.observations) > self.end_time.hour - self.start_time.hour + 1:
+            raise ValueError("There are observations for hours outside the session")
+        return self
+
+
+class SessionPublic(pyd.BaseModel):
+    id: uuid.UUID
+    date: datetime.date
+    start_time: datetime.time
+    end_time: datetime.time
+    location: str
+    sport: sessions.Sport
+    equipment: str
+    power_level: sessions.PowerLevel
+    observations: list[WindObservation]
+
+
+def _to_public(wind_session: sessions.WindSession) -> SessionPublic:
+    return SessionPublic(
+        id=wind_session.id,
+        date=wind_session.date,
+        start_time=wind_session.start_time,
+        end_time=wind_session.end_time,
+        location=wind_session.location,
+        sport=wind_session.sport,
+        equipment=wind_session.equipment,
+        power_level=wind_session.power_level,
+        observations=[
+            WindObservation(
+                average_speed_kts=average,
+                gust_speed_kts=gust,
+                direction_degrees=direction,
+            )
+            for average, gust, direction in zip(
+                wind_session.average_speed_kts,
+                wind_session.gust_speed_kts,
+                wind_session.direction_degrees,
+                strict=True,
+            )
+        ],
+    )
+
+
+@router.get("/")
+async def get_sessions(
+    session: DatabaseSession,
+    current_user: CurrentPrincipal,
+    page_params: Annotated[PageParams, Query()],
+) -> db.Page[SessionPublic]:
+    """
+    Paginate through your sessions, the most recent first.
+    """
+    try:
+        page = await sessions.get_all(
+            session, current_user, page_params.cursor, page_params.count
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return db.Page(
+        items=[_to_public(wind_session) for wind_session in page.items],
+        after=page.after,
+        before=page.before,
+    )
+
+
+@router.get("/summary")
+async def get_summary(
+    session: DatabaseSession, current_user: CurrentPrincipal
+) -> wind_statistics.WindSummary:
+    """
+    Summarize the wind during your sessions, overall and by location.
+    """
+    return await wind_statistics.get_summary(session, current_user)
+
+
+@router.post("/bulk")
+async def create_sessions(
+    session: DatabaseSession,
+    current_user: CurrentUser,
+    body: Annotated[
+        list[SessionCreate],
+        Body(min_length=1, max_length=config.settings().SESSIONS_BULK_MAX_SIZE),
+    ],
+) -> list[uuid.UUID]:
+    """
+    Record many sessions at once, such as a logbook kept elsewhere, and return
+    their IDs in the order they were given.
+    """
+    return await sessions.create_many(
+        session, current_user, [new_session.model_dump() for new_session in body]
+    )
@@ -1,12 +1,18 @@
+import csv
+import io
+import json
 import uuid
-from typing import Annotated, Any
+from collections.abc import AsyncIterator, Sequence
+from typing import Annotated, Any, Literal
 
 import pydantic as pyd
-from fastapi import APIRouter, HTTPException, Query
+import sqlalchemy as sql
+from fastapi import APIRouter, Body, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 
-from app.api.deps import CurrentUser, DatabaseSession
+from app.api.deps import CurrentPrincipal, CurrentUser, DatabaseSession
 from app.api.models import PageParams
-from app.core import db, users
+from app.core import config, db, users
 from app.core.exceptions import AlreadyExists
 
 router = APIRouter(prefix="/users", tags=["users"])
@@ -18,6 +24,14 @@ class UserCreate(pyd.BaseModel):
     password: str = pyd.Field(min_length=8, max_length=40)
 
 
+class UserCreateResult(pyd.BaseModel):
+    model_config = pyd.ConfigDict(from_attributes=True)
+
+    email: pyd.EmailStr
+    id: uuid.UUID | None
+    status: Literal["created", "duplicate"]
+
+
 class UserPublic(pyd.BaseModel):
     model_config = pyd.ConfigDict(from_attributes=True)
 
@@ -26,37 +40,89 @@ class UserPublic(pyd.BaseModel):
     name: str
 
 
+class UserLookup(pyd.BaseModel):
+    id: uuid.UUID
+    status: Literal["found", "missing", "forbidden"]
+    user: UserPublic | None
+
+
 class UserUpdate(pyd.BaseModel):
     email: pyd.EmailStr | None = pyd.Field(default=None, max_length=255)
     name: str | None = pyd.Field(default=None, max_length=255)
     password: str | None = pyd.Field(default=None, min_length=8, max_length=40)
 
 
-@router.get("/")
+_user_adapter = pyd.TypeAdapter(UserPublic)
+_users_page_adapter = pyd.TypeAdapter(db.Page[UserPublic])
+_create_results_adapter = pyd.TypeAdapter(list[UserCreateResult])
+_lookups_adapter = pyd.TypeAdapter(list[UserLookup])
+
+
+def _from_attributes[M: pyd.BaseModel](model: type[M], obj: Any) -> M:
+    # Rows read back from the database were validated on the way in
+    return model.model_construct(
+        **{name: getattr(obj, name) for name in model.model_fields}
+    )
+
+
+def _json_response[T](
+    adapter: pyd.TypeAdapter[T], value: T, headers: dict[str, str] | None = None
+) -> Response:
+    # Encoded to bytes in a single pass, which FastAPI then sends as is instead
+    # of validating and encoding against the response model again
+    return Response(
+        adapter.dump_json(value), media_type="application/json", headers=headers
+    )
+
+
+def _cache_headers(version: int) -> dict[str, str]:
+    # Clients may keep the user but must check it is current before reusing it
+    return {"ETag": f'W/"{version}"', "Cache-Control": "private, no-cache"}
+
+
+def _matches(if_none_match: str | None, version: int) -> bool:
+    if if_none_match is None:
+        return False
+
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or f'"{version}"' in tags
+
+
+IfNoneMatch = Annotated[str | None, Header()]
+
+
+@router.get("/", response_model=db.Page[UserPublic])
 async def get_users(
     session: DatabaseSession,
-    current_user: CurrentUser,
+    current_user: CurrentPrincipal,
     page_params: Annotated[PageParams, Query()],
-) -> db.Page[UserPublic]:
+) -> Response:
     """
     Paginate through all users.
 
     Accessible only to administrators.
     """
-    page = await users.get_all(
-        session, current_user, page_params.cursor, page_params.count
-    )
-    return db.Page(
-        items=[UserPublic.model_validate(user) for user in page.items],
-        after=page.after,
-        before=page.before,
+    try:
+        page = await users.get_all(
+            session, current_user, page_params.cursor, page_params.count
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return _json_response(
+        _users_page_adapter,
+        db.Page(
+            items=[_from_attributes(UserPublic, user) for user in page.items],
+            after=page.after,
+            before=page.before,
+        ),
     )
 
 
-@router.post("/")
+@router.post("/", response_model=UserPublic)
 async def create_user(
     session: DatabaseSession, current_user: CurrentUser, body: UserCreate
-) -> UserPublic:
+) -> Response:
     """
     Create a new user.
 
@@ -64,37 +130,183 @@ async def create_user(
     """
     try:
         user = await users.create(session, current_user, **body.model_dump())
-        return UserPublic.model_validate(user)
+        return _json_response(_user_adapter, _from_attributes(UserPublic, user))
     except AlreadyExists as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/bulk", response_model=list[UserCreateResult])
+async def create_users(
+    session: DatabaseSession,
+    current_user: CurrentUser,
+    body: Annotated[
+        list[UserCreate],
+        Body(min_length=1, max_length=config.settings().USERS_BULK_MAX_SIZE),
+    ],
+) -> Response:
+    """
+    Create many users at once.
+
+    Users whose email is already taken, including by an earlier entry in the
+    same request, are skipped and reported as duplicates.
+
+    Accessible only to administrators.
+    """
+    results = await users.create_many(
+        session, current_user, [new_user.model_dump() for new_user in body]
+    )
+    return _json_response(
+        _create_results_adapter,
+        [_from_attributes(UserCreateResult, result) for result in results],
+    )
+
+
+_EXPORT_COLUMNS = ("id", "email", "name", "admin")
+
+
+async def _export_ndjson(
+    partitions: AsyncIterator[Sequence[sql.Row[Any]]],
+) -> AsyncIterator[bytes]:
+    async for rows in partitions:
+        yield "".join(
+            json.dumps(
+                {
+                    "id": str(row.id),
+                    "email": row.email,
+                    "name": row.name,
+                    "admin": row.admin,
+                }
+            )
+            + "\n"
+            for row in rows
+        ).encode()
+
+
+async def _export_csv(
+    partitions: AsyncIterator[Sequence[sql.Row[Any]]],
+) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(_EXPORT_COLUMNS)
+
+    async for rows in partitions:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+@router.get("/export", response_class=StreamingResponse)
+def export_users(
+    current_user: CurrentPrincipal, format: Literal["ndjson", "csv"] = "ndjson"
+) -> StreamingResponse:
+    """
+    Stream every user as newline-delimited JSON or CSV.
+
+    Accessible only to administrators.
+    """
+    partitions = users.export(current_user)
+
+    if format == "csv":
+        return StreamingResponse(
+            _export_csv(partitions),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="users.csv"'},
+        )
+
+    return StreamingResponse(
+        _export_ndjson(partitions),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="users.ndjson"'},
+    )
+
+
+@router.get("/batch", response_model=list[UserLookup])
+async def get_users_by_id(
+    session: DatabaseSession,
+    current_user: CurrentPrincipal,
+    ids: Annotated[
+        list[uuid.UUID],
+        Query(min_length=1, max_length=config.settings().USERS_BATCH_LOOKUP_MAX_SIZE),
+    ],
+) -> Response:
+    """
+    Get several users by their IDs, in the order they were requested.
+
+    Each ID is reported as found, missing, or forbidden when the current user
+    may not see it.
+    """
+    results = await users.get_many(session, current_user, ids)
+    return _json_response(
+        _lookups_adapter,
+        [
+            UserLookup.model_construct(
+                id=result.id,
+                status=result.status,
+                user=result.user and _from_attributes(UserPublic, result.user),
+            )
+            for result in results
+        ],
+    )
+
+
 @router.get("/me", response_model=UserPublic)
-def get_me(current_user: CurrentUser) -> Any:
+def get_me(
+    current_user: CurrentPrincipal, if_none_match: IfNoneMatch = None
+) -> Response:
     """
     Return the currently authenticated user.
     """
-    return current_user
+    headers = _cache_headers(current_user.version)
+
+    if _matches(if_none_match, current_user.version):
+        return Response(status_code=304, headers=headers)
+
+    return _json_response(
+        _user_adapter, _from_attributes(UserPublic, current_user), headers
+    )
 
 
-@router.get("/{user_id}")
+@router.get("/{user_id}", response_model=UserPublic)
 async def get_user(
-    session: DatabaseSession, current_user: CurrentUser, user_id: uuid.UUID
-) -> UserPublic:
+    session: DatabaseSession,
+    current_user: CurrentPrincipal,
+    user_id: uuid.UUID,
+    if_none_match: IfNoneMatch = None,
+) -> Response:
     """
     Get a user by their ID.
     """
+    # A conditional request is answered from the version alone when it matches
+    if if_none_match is not None:
+        version = await users.get_version(session, current_user, user_id)
+
+        if version is None:
+            raise HTTPException(status_code=404)
+
+        if _matches(if_none_match, version):
+            return Response(status_code=304, headers=_cache_headers(version))
+
     user = await users.get_one(session, current_user, user_id)
-    return UserPublic.model_validate(user)
 
+    if not user:
+        raise HTTPException(status_code=404)
 
-@router.patch("/{user_id}")
+    return _json_response(
+        _user_adapter, _from_attributes(UserPublic, user), _cache_headers(user.version)
+    )
+
+
+@router.patch("/{user_id}", response_model=UserPublic)
 async def update_user(
     session: DatabaseSession,
     current_user: CurrentUser,
     user_id: uuid.UUID,
     body: UserUpdate,
-) -> UserPublic:
+) -> Response:
     """
     Update a user.
     """
@@ -103,7 +315,9 @@ async def update_user(
     if not user:
         raise HTTPException(status_code=404)
 
-    return UserPublic.model_validate(user)
+    return _json_response(
+        _user_adapter, _from_attributes(UserPublic, user), _cache_headers(user.version)
+    )
 
 
 @router.delete("/{user_id}")
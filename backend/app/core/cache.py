@@ -0,0 +1,116 @@
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+
+@dataclass
+class CacheStats:
+    size: int
+    max_size: int
+    hits: int
+    misses: int
+
+
+class TTLCache[K, V]:
+    """
+    Bounded LRU mapping whose entries expire after a time to live.
+
+    Not thread safe; use it from the event loop only.
+    """
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[K, tuple[float, V]] = OrderedDict()
+
+    def get(self, key: K) -> V | None:
+        entry = self._entries.get(key)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires, value = entry
+        if expires <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: K, value: V, ttl: float | None = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def discard_where(self, predicate: Callable[[V], bool]) -> None:
+        for key in [key for key, (_, v) in self._entries.items() if predicate(v)]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            size=len(self._entries),
+            max_size=self.max_size,
+            hits=self.hits,
+            misses=self.misses,
+        )
+
+
+@dataclass
+class _Flight[V]:
+    task: asyncio.Future[V]
+    waiters: int = 0
+
+
+class SingleFlight[K, V]:
+    """
+    Runs at most one call per key at a time, sharing its result or exception
+    with every caller that asks for the same key while it is in flight.
+
+    A caller that is cancelled stops waiting without affecting the others; the
+    call itself is only cancelled once nobody is waiting for it.
+    """
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.shared = 0
+        self._flights: dict[K, _Flight[V]] = {}
+
+    async def do(self, key: K, fn: Callable[[], Awaitable[V]]) -> V:
+        flight = self._flights.get(key)
+
+        if flight is None:
+            self.calls += 1
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._land(key, flight))
+        else:
+            self.shared += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                self._land(key, flight)
+                flight.task.cancel()
+
+    def _land(self, key: K, flight: _Flight[V]) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
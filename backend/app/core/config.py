@@ -29,11 +29,21 @@ class Settings(BaseSettings):
         env_file="../.env",
         env_ignore_empty=True,
         extra="ignore",
+        frozen=True,
     )
     API_V1_STR: str = "/api/v1"
     SECRET_KEY: str = secrets.token_urlsafe(32)
     # 60 minutes * 24 hours * 8 days = 8 days
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
+    # Embed the user's claims in short-lived access tokens, so requests can be
+    # authenticated without loading the user, and issue refresh tokens
+    SELF_CONTAINED_TOKENS: bool = False
+    SELF_CONTAINED_ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
+    REFRESH_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
+    # How often each worker picks up tokens revoked by other workers
+    TOKEN_REVOCATION_REFRESH_SECONDS: float = 5
+    # How often each worker deletes revocations of tokens that have expired
+    TOKEN_REVOCATION_PURGE_SECONDS: float = 60 * 60
     FRONTEND_HOST: str = "http://localhost:5173"
     ENVIRONMENT: Literal["local", "staging", "production"] = "local"
 
@@ -50,6 +60,7 @@ class Settings(BaseSettings):
 
     LOGIN_ENDPOINT: str = "/login/access-token"
     PASSWORD_RESET_ENDPOINT: str = "/reset-password"
+    REFRESH_TOKEN_ENDPOINT: str = "/login/refresh-token"
     PROJECT_NAME: str
     POSTGRES_SERVER: str
     POSTGRES_PORT: int = 5432
@@ -57,6 +68,19 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: str = ""
     POSTGRES_DB: str = ""
 
+    # Read-only replicas of the database that SELECTs are spread across
+    POSTGRES_REPLICA_URIS: Annotated[
+        list[PostgresDsn] | str, BeforeValidator(parse_cors)
+    ] = []
+    # How long a replica is skipped after its connection fails
+    POSTGRES_REPLICA_EJECT_SECONDS: float = 30
+    POSTGRES_POOL_SIZE: int = 5
+    POSTGRES_MAX_OVERFLOW: int = 10
+    POSTGRES_POOL_TIMEOUT: float = 30
+    # Seconds after which connections are replaced, -1 to keep them forever
+    POSTGRES_POOL_RECYCLE: int = -1
+    POSTGRES_POOL_PRE_PING: bool = False
+
     @computed_field  # type: ignore[prop-decorator]
     @property
     def SQLALCHEMY_DATABASE_URI(self) -> PostgresDsn:
@@ -76,15 +100,57 @@ class Settings(BaseSettings):
     SMTP_PASSWORD: str | None = None
     EMAILS_FROM_EMAIL: EmailStr | None = None
     EMAILS_FROM_NAME: EmailStr | None = None
+    # Connections kept open to the SMTP server, closed once idle for
+    # SMTP_IDLE_TIMEOUT_SECONDS or after SMTP_MAX_MESSAGES_PER_CONNECTION
+    SMTP_POOL_SIZE: int = 4
+    SMTP_IDLE_TIMEOUT_SECONDS: float = 30
+    SMTP_MAX_MESSAGES_PER_CONNECTION: int = 100
+    SMTP_TIMEOUT_SECONDS: float = 60
 
     @model_validator(mode="after")
     def _set_default_emails_from(self) -> Self:
         if not self.EMAILS_FROM_NAME:
-            self.EMAILS_FROM_NAME = self.PROJECT_NAME  # pyright: ignore[reportConstantRedefinition]
+            # Settings are frozen, so assign around pydantic's __setattr__
+            object.__setattr__(self, "EMAILS_FROM_NAME", self.PROJECT_NAME)
         return self
 
     EMAIL_RESET_TOKEN_EXPIRE_HOURS: int = 48
 
+    # Emails are queued in the email_outbox table and delivered in batches by
+    # this many workers per process. Each delivery is tried OUTBOX_SEND_ATTEMPTS
+    # times in a row, then retried after an exponentially growing delay until
+    # OUTBOX_MAX_ATTEMPTS, after which the email is dead-lettered. Claimed emails
+    # are retried once OUTBOX_LEASE_SECONDS pass without the outcome being saved,
+    # so a worker stops sending its batch before then
+    OUTBOX_WORKERS: int = 2
+    OUTBOX_BATCH_SIZE: int = 20
+    OUTBOX_POLL_SECONDS: float = 1
+    OUTBOX_SEND_ATTEMPTS: int = 3
+    OUTBOX_SEND_BACKOFF_MAX_SECONDS: float = 5
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_RETRY_BASE_SECONDS: float = 30
+    OUTBOX_RETRY_MAX_SECONDS: float = 60 * 60
+    OUTBOX_LEASE_SECONDS: float = 10 * 60
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def outbox_send_max_seconds(self) -> float:
+        # Each attempt is cut short after SMTP_TIMEOUT_SECONDS
+        return (
+            self.OUTBOX_SEND_ATTEMPTS * self.SMTP_TIMEOUT_SECONDS
+            + (self.OUTBOX_SEND_ATTEMPTS - 1) * self.OUTBOX_SEND_BACKOFF_MAX_SECONDS
+        )
+
+    @model_validator(mode="after")
+    def _check_outbox_lease(self) -> Self:
+        # Otherwise no email could be sent before its lease runs out
+        if self.OUTBOX_LEASE_SECONDS <= self.outbox_send_max_seconds:
+            raise ValueError(
+                "OUTBOX_LEASE_SECONDS must exceed the longest a single email can "
+                f"take to send, {self.outbox_send_max_seconds} seconds"
+            )
+        return self
+
     @computed_field  # type: ignore[prop-decorator]
     @property
     def emails_enabled(self) -> bool:
@@ -93,6 +159,52 @@ class Settings(BaseSettings):
     FIRST_SUPERUSER: EmailStr
     FIRST_SUPERUSER_PASSWORD: str
 
+    # How long a migration waits for a lock before failing
+    MIGRATION_LOCK_TIMEOUT_SECONDS: float = 5
+
+    # Each request's database work is reported in a Server-Timing header and,
+    # optionally, a log line. Requests running more than
+    # QUERY_COUNT_WARNING_THRESHOLD statements are logged as warnings
+    SERVER_TIMING_ENABLED: bool = True
+    REQUEST_LOG_ENABLED: bool = False
+    QUERY_COUNT_WARNING_THRESHOLD: int = 20
+
+    # Per-worker cache of the users resolved from access tokens
+    PRINCIPAL_CACHE_ENABLED: bool = True
+    PRINCIPAL_CACHE_MAX_SIZE: int = 10_000
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 30
+
+    # Rows fetched per round trip when streaming the user export
+    USERS_EXPORT_BATCH_SIZE: int = 1000
+    # Users accepted per bulk creation request, and inserted per statement
+    USERS_BULK_MAX_SIZE: int = 5000
+    USERS_BULK_INSERT_BATCH_SIZE: int = 1000
+    # Users that can be looked up by ID in a single request
+    USERS_BATCH_LOOKUP_MAX_SIZE: int = 100
+
+    # Sessions accepted per bulk ingest request, and inserted per statement,
+    # which stays well below the 65535 parameters Postgres allows
+    SESSIONS_BULK_MAX_SIZE: int = 10_000
+    SESSIONS_BULK_INSERT_BATCH_SIZE: int = 2000
+
+    # Login attempts allowed per email address and per client address within
+    # any LOGIN_ATTEMPT_WINDOW_SECONDS, and password checks allowed at once
+    LOGIN_ATTEMPTS_PER_EMAIL: int = 10
+    LOGIN_ATTEMPTS_PER_CLIENT: int = 50
+    LOGIN_ATTEMPT_WINDOW_SECONDS: float = 60
+    LOGIN_THROTTLE_MAX_KEYS: int = 100_000
+    LOGIN_MAX_CONCURRENT_VERIFIES: int = 16
+    # Addresses or networks of the proxies in front of the backend, such as
+    # Traefik, whose X-Forwarded-For header names the actual client
+    TRUSTED_PROXIES: Annotated[list[str] | str, BeforeValidator(parse_cors)] = []
+
+    # bcrypt cost factor, see scripts/calibrate-bcrypt.py
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASHING_EXECUTOR: Literal["thread", "process"] = "thread"
+    PASSWORD_HASHING_WORKERS: int = 4
+    # Hashing jobs allowed to wait for a free worker before new ones are rejected
+    PASSWORD_HASHING_MAX_QUEUE: int = 32
+
     def _check_default_secret(self, var_name: str, value: str | None) -> None:
         if value == "changethis":
             message = (
@@ -115,5 +227,17 @@ class Settings(BaseSettings):
         return self
 
 
+_settings: Settings | None = None
+
+
 def settings() -> Settings:
-    return Settings()  # type: ignore
+    if _settings is None:
+        return reload()
+
+    return _settings
+
+
+def reload() -> Settings:
+    global _settings
+    _settings = Settings()  # type: ignore
+    return _settings
@@ -1,42 +1,452 @@
+import base64
+import datetime
+import hmac
+import itertools
+import json
+import os
+import time
+import uuid
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass
+from typing import Any
 
-from pydantic import BaseModel
-from sqlakeyset.asyncio import select_page
-from sqlalchemy import Select
+import sqlalchemy as sql
+from sqlalchemy import Delete, Engine, Insert, Select, Update, event
+from sqlalchemy.engine import ExceptionContext
 from sqlalchemy.ext.asyncio import (
     AsyncAttrs,
+    AsyncEngine,
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.orm import (
+    DeclarativeBase,
+    Mapped,
+    QueryableAttribute,
+    Session,
+    mapped_column,
+)
+from sqlalchemy.pool import AsyncAdaptedQueuePool, PoolProxiedConnection
+
+from app.core import config, metrics
+
+_checkout_wait = metrics.Histogram()
+
+
+@dataclass
+class QueryStats:
+    queries: int = 0
+    query_seconds: float = 0
+    pool_wait_seconds: float = 0
+
+
+_query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+_QUERY_STARTED_AT = "query_started_at"
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """
+    Count the statements executed, and the time spent on them and waiting for
+    pooled connections, by the current task and those it starts.
+    """
+    stats = QueryStats()
+    token = _query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _query_stats.reset(token)
+
+
+def _before_cursor_execute(connection: sql.Connection, *_: Any) -> None:
+    if _query_stats.get() is not None:
+        connection.info[_QUERY_STARTED_AT] = time.perf_counter()
+
+
+def _after_cursor_execute(connection: sql.Connection, *_: Any) -> None:
+    started_at = connection.info.pop(_QUERY_STARTED_AT, None)
+
+    if started_at is not None and (stats := _query_stats.get()) is not None:
+        stats.queries += 1
+        stats.query_seconds += time.perf_counter() - started_at
+
+
+@dataclass
+class _Checkout:
+    connecting_since: float | None = None
+    connect_seconds: float = 0
+
+
+# Opening a new connection is part of a checkout but not time spent waiting for
+# a free slot, so the connect events set it aside
+_checkout: ContextVar[_Checkout | None] = ContextVar("checkout", default=None)
+
+
+def _before_connect(*_: Any) -> None:
+    if (checkout := _checkout.get()) is not None:
+        checkout.connecting_since = time.perf_counter()
+
+
+def _after_connect(*_: Any) -> None:
+    checkout = _checkout.get()
+
+    if checkout is not None and checkout.connecting_since is not None:
+        checkout.connect_seconds += time.perf_counter() - checkout.connecting_since
+        checkout.connecting_since = None
+
+
+class _InstrumentedPool(AsyncAdaptedQueuePool):
+    def connect(self) -> PoolProxiedConnection:
+        checkout = _Checkout()
+        token = _checkout.set(checkout)
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            end = time.perf_counter()
+            _checkout.reset(token)
+            # A connection attempt that failed never reached the connect event
+            if checkout.connecting_since is not None:
+                checkout.connect_seconds += end - checkout.connecting_since
+
+            waited = end - start - checkout.connect_seconds
+            _checkout_wait.observe(waited)
+            if (stats := _query_stats.get()) is not None:
+                stats.pool_wait_seconds += waited
+
+
+@dataclass
+class _Replica:
+    engine: AsyncEngine
+    ejected_until: float = 0
+
+
+_engine: AsyncEngine | None = None
+_replicas: list[_Replica] | None = None
+_replica_turns = itertools.count()
+_sessionmaker: async_sessionmaker[AsyncSession] | None = None
+# Set in Session.info to send every statement of a session to the primary
+PINNED_TO_PRIMARY = "pinned_to_primary"
+_REPLICA = "replica"
+
+
+def _create_engine(url: str) -> AsyncEngine:
+    settings = config.settings()
+    created = create_async_engine(
+        url,
+        poolclass=_InstrumentedPool,
+        pool_size=settings.POSTGRES_POOL_SIZE,
+        max_overflow=settings.POSTGRES_MAX_OVERFLOW,
+        pool_timeout=settings.POSTGRES_POOL_TIMEOUT,
+        pool_recycle=settings.POSTGRES_POOL_RECYCLE,
+        pool_pre_ping=settings.POSTGRES_POOL_PRE_PING,
+    )
+    event.listen(created.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(created.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(created.sync_engine, "do_connect", _before_connect)
+    event.listen(created.sync_engine, "connect", _after_connect)
+    return created
+
+
+def engine() -> AsyncEngine:
+    global _engine
+
+    if _engine is None:
+        _engine = _create_engine(str(config.settings().SQLALCHEMY_DATABASE_URI))
+
+    return _engine
+
+
+def replicas() -> list[_Replica]:
+    global _replicas
+
+    if _replicas is None:
+        _replicas = []
+        for url in config.settings().POSTGRES_REPLICA_URIS:
+            replica = _Replica(_create_engine(str(url)))
+            event.listen(replica.engine.sync_engine, "handle_error", _ejector(replica))
+            _replicas.append(replica)
+
+    return _replicas
+
+
+def _ejector(replica: _Replica) -> Callable[[ExceptionContext], None]:
+    def eject(context: ExceptionContext) -> None:
+        if context.is_disconnect or context.connection is None:
+            eject_seconds = config.settings().POSTGRES_REPLICA_EJECT_SECONDS
+            replica.ejected_until = time.monotonic() + eject_seconds
+
+    return eject
+
+
+def _choose_replica() -> _Replica | None:
+    candidates = replicas()
+    now = time.monotonic()
+
+    for _ in range(len(candidates)):
+        replica = candidates[next(_replica_turns) % len(candidates)]
+        if replica.ejected_until <= now:
+            return replica
+
+    return None
+
+
+class _RoutingSession(Session):
+    """
+    Sends plain SELECTs to a healthy replica, chosen round robin per session,
+    and everything else to the primary. A session keeps reading from the same
+    replica, so that it never sees data go back in time between replicas that
+    lag by different amounts. Once a session writes, is pinned, or loses its
+    replica, it stays on the primary so that it reads its own writes.
+    """
 
-from app.core.config import settings
+    def get_bind(self, mapper: Any = None, clause: Any = None, **kwargs: Any) -> Engine:
+        if self._flushing or isinstance(clause, Insert | Update | Delete):
+            self.info[PINNED_TO_PRIMARY] = True
+        elif isinstance(clause, Select) and not self.info.get(PINNED_TO_PRIMARY):
+            if _REPLICA not in self.info:
+                self.info[_REPLICA] = _choose_replica()
 
-engine = create_async_engine(str(settings().SQLALCHEMY_DATABASE_URI))
-get_session = async_sessionmaker(engine, expire_on_commit=False)
+            replica: _Replica | None = self.info[_REPLICA]
+            if replica is not None:
+                if replica.ejected_until <= time.monotonic():
+                    return replica.engine.sync_engine
+
+                # Another replica could be further behind than the one lost
+                self.info[PINNED_TO_PRIMARY] = True
+
+        return engine().sync_engine
+
+
+def get_session(*, pin_to_primary: bool = False) -> AsyncSession:
+    global _sessionmaker
+
+    if _sessionmaker is None:
+        _sessionmaker = async_sessionmaker(
+            engine(), sync_session_class=_RoutingSession, expire_on_commit=False
+        )
+
+    session = _sessionmaker()
+    if pin_to_primary:
+        session.info[PINNED_TO_PRIMARY] = True
+
+    return session
+
+
+async def dispose() -> None:
+    global _engine, _replicas, _sessionmaker
+
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = None
+
+    for replica in _replicas or []:
+        await replica.engine.dispose()
+
+    _replicas = None
+    _sessionmaker = None
+
+
+def _discard_inherited_connections() -> None:
+    # Connections opened before a fork belong to the parent process, so the
+    # child replaces its pools without closing them
+    if _engine is not None:
+        _engine.sync_engine.dispose(close=False)
+
+    for replica in _replicas or []:
+        replica.engine.sync_engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_discard_inherited_connections)
+
+
+@dataclass
+class PoolStats:
+    size: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    checkout_wait: metrics.Histogram
+
+
+def pool_stats() -> PoolStats:
+    pool = engine().pool
+    assert isinstance(pool, AsyncAdaptedQueuePool)
+    return PoolStats(
+        size=pool.size(),
+        checked_in=pool.checkedin(),
+        checked_out=pool.checkedout(),
+        # QueuePool counts unopened connections as negative overflow
+        overflow=max(pool.overflow(), 0),
+        checkout_wait=_checkout_wait,
+    )
 
 
 class Base(AsyncAttrs, DeclarativeBase):
     pass
 
 
+_uuid7_last_ms = 0
+_uuid7_counter = 0
+
+
+def uuid7() -> uuid.UUID:
+    """
+    A time-ordered UUID as described by RFC 9562: 48 bits of Unix time in
+    milliseconds, a 12-bit counter that keeps IDs made in the same millisecond
+    in order, and 62 random bits.
+    """
+    global _uuid7_last_ms, _uuid7_counter
+
+    unix_ms = time.time_ns() // 1_000_000
+    if unix_ms > _uuid7_last_ms:
+        _uuid7_last_ms = unix_ms
+        _uuid7_counter = 0
+    else:
+        _uuid7_counter += 1
+        # Once the counter runs out, borrow from the next millisecond
+        if _uuid7_counter > 0xFFF:
+            _uuid7_last_ms += 1
+            _uuid7_counter = 0
+
+    random_bits = int.from_bytes(os.urandom(8)) & (1 << 62) - 1
+    return uuid.UUID(
+        int=_uuid7_last_ms << 80
+        | 0x7 << 76
+        | _uuid7_counter << 64
+        | 0b10 << 62
+        | random_bits
+    )
+
+
+def uuid_primary_key() -> Mapped[uuid.UUID]:
+    # The server default, created by migration 5e1c7a9d3f20, covers rows
+    # inserted without going through the models
+    return mapped_column(
+        sql.Uuid,
+        primary_key=True,
+        default_factory=uuid7,
+        server_default=sql.func.uuid_generate_v7(),
+    )
+
+
 @dataclass
-class Page[T](BaseModel):
+class Page[T]:
     items: list[T]
     after: str | None
     before: str | None
 
 
+_AFTER = "a"
+_BEFORE = "b"
+_CURSOR_SIGNATURE_BYTES = 8
+
+
+def _sign(payload: bytes) -> bytes:
+    key = config.settings().SECRET_KEY.encode()
+    return hmac.digest(key, payload, "sha256")[:_CURSOR_SIGNATURE_BYTES]
+
+
+def _encode_cursor(direction: str, values: Sequence[Any]) -> str:
+    payload = json.dumps(
+        [direction, *(_to_json(value) for value in values)], separators=(",", ":")
+    ).encode()
+    return base64.urlsafe_b64encode(payload + _sign(payload)).rstrip(b"=").decode()
+
+
+def _decode_cursor(
+    cursor: str, keys: Sequence[QueryableAttribute[Any]]
+) -> tuple[str, list[Any]]:
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = data[:-_CURSOR_SIGNATURE_BYTES]
+        signature = data[-_CURSOR_SIGNATURE_BYTES:]
+        if not hmac.compare_digest(signature, _sign(payload)):
+            raise ValueError()
+
+        direction, *values = json.loads(payload)
+        if direction not in (_AFTER, _BEFORE) or len(values) != len(keys):
+            raise ValueError()
+
+        return direction, [
+            _from_json(value, key.type.python_type)
+            for value, key in zip(values, keys, strict=True)
+        ]
+    except ValueError:
+        raise ValueError("Invalid cursor")
+
+
+def _to_json(value: Any) -> Any:
+    match value:
+        case uuid.UUID():
+            return value.hex
+        case datetime.date() | datetime.time():
+            return value.isoformat()
+        case _:
+            return value
+
+
+def _from_json(value: Any, python_type: type) -> Any:
+    if python_type is uuid.UUID:
+        return uuid.UUID(value)
+    # Datetimes are dates as well
+    if issubclass(python_type, datetime.date | datetime.time):
+        return python_type.fromisoformat(value)
+    return value
+
+
 async def keyset_paginate[T](
     session: AsyncSession,
     selectable: Select[tuple[T]],
+    keys: Sequence[QueryableAttribute[Any]],
     page_size: int,
     cursor: str | None = None,
+    *,
+    descending: bool = False,
 ) -> Page[T]:
-    page = await select_page(session, selectable, per_page=page_size, page=cursor)
+    """
+    Return the page of `selectable` that follows, or precedes, `cursor`.
+
+    Rows are ordered by `keys`, which must uniquely identify a row and should be
+    covered by an index; `selectable` must not be ordered already. Cursors are
+    signed, so clients cannot forge a position.
+    """
+    direction, values = _decode_cursor(cursor, keys) if cursor else (_AFTER, [])
+    backwards = direction == _BEFORE
+    ascending = descending == backwards
+
+    query = selectable.add_columns(*keys)
+    if values:
+        position = sql.tuple_(*keys)
+        bound = sql.tuple_(
+            *(
+                sql.literal(value, key.type)
+                for value, key in zip(values, keys, strict=True)
+            )
+        )
+        query = query.where(position > bound if ascending else position < bound)
+
+    query = query.order_by(
+        *(key.asc() if ascending else key.desc() for key in keys)
+    ).limit(page_size + 1)
+
+    rows = (await session.execute(query)).all()
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows = list(reversed(rows))
+
+    if not rows:
+        return Page(items=[], after=None, before=None)
+
+    # A cursor always points at an existing row, so there is more on its side
+    first = _encode_cursor(_BEFORE, rows[0][1:])
+    last = _encode_cursor(_AFTER, rows[-1][1:])
     return Page(
-        items=[row[0] for row in page],  # type: ignore
-        after=page.paging.bookmark_next if page.paging.has_next else None,
-        before=page.paging.bookmark_previous if page.paging.has_previous else None,
+        items=[row[0] for row in rows],
+        after=last if has_more or backwards else None,
+        before=first if (has_more if backwards else cursor) else None,
     )
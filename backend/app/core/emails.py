@@ -1,11 +1,14 @@
+import asyncio
 import logging
+import time
+from collections.abc import Sequence
 from dataclasses import dataclass
 from email.message import EmailMessage
 from pathlib import Path
 from typing import Any
 
 import aiosmtplib
-from jinja2 import Template
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
 
 from app.core import config
 
@@ -19,29 +22,211 @@ class EmailData:
     subject: str
 
 
+_TEMPLATES_DIR = Path(__file__).parent.parent / "email-templates" / "build"
+# Templates are only read and compiled once per process, and the compiled
+# bytecode is shared between processes through the bytecode cache
+_environment = Environment(
+    loader=FileSystemLoader(_TEMPLATES_DIR),
+    bytecode_cache=FileSystemBytecodeCache(),
+    auto_reload=False,
+)
+_bound_settings: config.Settings | None = None
+
+
+def _get_environment() -> Environment:
+    global _bound_settings
+
+    settings = config.settings()
+    if settings is not _bound_settings:
+        _environment.globals.update(
+            project_name=settings.PROJECT_NAME, frontend_host=settings.FRONTEND_HOST
+        )
+        _bound_settings = settings
+
+    return _environment
+
+
+def load_templates() -> None:
+    environment = _get_environment()
+    template_names = environment.list_templates()
+
+    if not template_names:
+        raise FileNotFoundError(f"No email templates found in {_TEMPLATES_DIR}")
+
+    for template_name in template_names:
+        environment.get_template(template_name)
+
+
 def render_email_template(*, template_name: str, context: dict[str, Any]) -> str:
-    template_str = (
-        Path(__file__).parent / "email-templates" / "build" / template_name
-    ).read_text()
-    html_content = Template(template_str).render(context)
-    return html_content
+    return _get_environment().get_template(template_name).render(context)
 
 
-async def send_email(email: EmailData, email_to: str) -> None:
+@dataclass
+class _Connection:
+    client: aiosmtplib.SMTP
+    last_used: float
+    messages: int = 0
+
+
+class SMTPPool:
+    """
+    Long-lived SMTP connections, each used by one sender at a time.
+    """
+
+    def __init__(
+        self,
+        *,
+        hostname: str | None,
+        port: int,
+        username: str | None = None,
+        password: str | None = None,
+        use_tls: bool = False,
+        timeout: float = 60,
+        size: int = 4,
+        idle_timeout: float = 30,
+        max_messages: int = 100,
+    ) -> None:
+        self._connect_kwargs: dict[str, Any] = {
+            "hostname": hostname,
+            "port": port,
+            "username": username,
+            "password": password,
+            "use_tls": use_tls,
+            "timeout": timeout,
+        }
+        self._slots = asyncio.Semaphore(size)
+        self._idle: list[_Connection] = []
+        self._idle_timeout = idle_timeout
+        self._max_messages = max_messages
+
+    async def _connect(self) -> _Connection:
+        client = aiosmtplib.SMTP(**self._connect_kwargs)
+        await client.connect()
+        return _Connection(client=client, last_used=time.monotonic())
+
+    async def _close(self, connection: _Connection) -> None:
+        try:
+            await connection.client.quit()
+        except aiosmtplib.SMTPException:
+            connection.client.close()
+
+    async def _checkout(self) -> _Connection:
+        while self._idle:
+            connection = self._idle.pop()
+            if (
+                connection.client.is_connected
+                and time.monotonic() - connection.last_used < self._idle_timeout
+            ):
+                return connection
+            await self._close(connection)
+
+        return await self._connect()
+
+    async def _deliver(
+        self, connection: _Connection, message: EmailMessage
+    ) -> _Connection:
+        if connection.messages >= self._max_messages:
+            await self._close(connection)
+            connection = await self._connect()
+
+        try:
+            await connection.client.send_message(message)
+        except aiosmtplib.SMTPServerDisconnected:
+            # Servers drop connections they consider idle without telling us
+            await self._close(connection)
+            connection = await self._connect()
+            await connection.client.send_message(message)
+
+        connection.messages += 1
+        return connection
+
+    async def send(self, messages: Sequence[EmailMessage]) -> list[Exception | None]:
+        """
+        Send messages over a single connection, returning the error for each
+        message the server refused. Raises if no connection can be made.
+        """
+        errors: list[Exception | None] = []
+
+        async with self._slots:
+            connection = await self._checkout()
+            try:
+                for message in messages:
+                    try:
+                        connection = await self._deliver(connection, message)
+                    except (
+                        aiosmtplib.SMTPRecipientsRefused,
+                        aiosmtplib.SMTPResponseException,
+                    ) as e:
+                        errors.append(e)
+                    else:
+                        errors.append(None)
+            except BaseException:
+                await self._close(connection)
+                raise
+
+            connection.last_used = time.monotonic()
+            self._idle.append(connection)
+
+        return errors
+
+    async def close(self) -> None:
+        while self._idle:
+            await self._close(self._idle.pop())
+
+
+_smtp_pool: SMTPPool | None = None
+
+
+def _get_smtp_pool() -> SMTPPool:
+    global _smtp_pool
+
+    if _smtp_pool is None:
+        settings = config.settings()
+        _smtp_pool = SMTPPool(
+            hostname=settings.SMTP_HOST,
+            port=settings.SMTP_PORT,
+            username=settings.SMTP_USER,
+            password=settings.SMTP_PASSWORD,
+            use_tls=settings.SMTP_TLS,
+            timeout=settings.SMTP_TIMEOUT_SECONDS,
+            size=settings.SMTP_POOL_SIZE,
+            idle_timeout=settings.SMTP_IDLE_TIMEOUT_SECONDS,
+            max_messages=settings.SMTP_MAX_MESSAGES_PER_CONNECTION,
+        )
+
+    return _smtp_pool
+
+
+async def close_smtp_pool() -> None:
+    global _smtp_pool
+
+    if _smtp_pool is not None:
+        await _smtp_pool.close()
+        _smtp_pool = None
+
+
+def _to_message(email: EmailData, email_to: str) -> EmailMessage:
     settings = config.settings()
     message = EmailMessage()
     message["From"] = f"{settings.EMAILS_FROM_NAME} <{settings.EMAILS_FROM_EMAIL}>"
     message["Subject"] = email.subject
     message["To"] = email_to
     message.set_content(email.html_content)
+    return message
+
+
+async def send_email(email: EmailData, email_to: str) -> None:
+    [error] = await _get_smtp_pool().send([_to_message(email, email_to)])
+
+    if error is not None:
+        raise error
+
 
-    await aiosmtplib.send(
-        message,
-        hostname=settings.SMTP_HOST,
-        port=settings.SMTP_PORT,
-        username=settings.SMTP_USER,
-        password=settings.SMTP_PASSWORD,
-        use_tls=settings.SMTP_TLS,
+async def send_emails(
+    messages: Sequence[tuple[EmailData, str]],
+) -> list[Exception | None]:
+    return await _get_smtp_pool().send(
+        [_to_message(email, email_to) for email, email_to in messages]
     )
 
 
@@ -51,7 +236,7 @@ def generate_test_email(email_to: str) -> EmailData:
     subject = f"{project_name} - Test email"
     html_content = render_email_template(
         template_name="test_email.html",
-        context={"project_name": settings.PROJECT_NAME, "email": email_to},
+        context={"email": email_to},
     )
     return EmailData(html_content=html_content, subject=subject)
 
@@ -62,11 +247,7 @@ def render_new_account_email(username: str) -> EmailData:
         subject=f"Welcome to {settings.PROJECT_NAME}!",
         html_content=render_email_template(
             template_name="new_account.html",
-            context={
-                "project_name": settings.PROJECT_NAME,
-                "username": username,
-                "link": settings.FRONTEND_HOST,
-            },
+            context={"username": username, "link": settings.FRONTEND_HOST},
         ),
     )
 
@@ -78,7 +259,6 @@ def render_reset_password_email(email: str, token: str) -> EmailData:
     html_content = render_email_template(
         template_name="reset_password.html",
         context={
-            "project_name": settings.PROJECT_NAME,
             "email": email,
             "valid_hours": settings.EMAIL_RESET_TOKEN_EXPIRE_HOURS,
             "link": link,
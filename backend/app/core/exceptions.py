@@ -6,5 +6,15 @@ class DoesNotExist(Exception):
     pass
 
 
+class Overloaded(Exception):
+    pass
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after: float) -> None:
+        super().__init__("Too many requests")
+        self.retry_after = retry_after
+
+
 class Unauthorized(Exception):
     pass
@@ -0,0 +1,27 @@
+import bisect
+from dataclasses import dataclass, field
+
+# Upper bounds, in seconds, of the buckets used for latency histograms
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+@dataclass
+class Histogram:
+    """
+    Observation counts per bucket, where counts[i] holds the observations no
+    greater than buckets[i] and the final count holds everything larger.
+    """
+
+    buckets: tuple[float, ...] = LATENCY_BUCKETS
+    counts: list[int] = field(default_factory=list)
+    count: int = 0
+    sum: float = 0
+
+    def __post_init__(self) -> None:
+        if not self.counts:
+            self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
@@ -0,0 +1,170 @@
+"""
+Helpers for migrations that must not block writes to large tables.
+
+They are meant to be called from the upgrade and downgrade functions of
+revisions in alembic/versions, for example:
+
+    from app.core import migrations
+
+    def upgrade():
+        with migrations.timeouts(lock_timeout="2s"):
+            op.add_column("users", sa.Column("country", sa.Text(), nullable = True))
+        migrations.backfill("users", "country = 'NL'", "country IS NULL")
+        migrations.create_index_concurrently("ix_users_country", "users", ["country"])
+"""
+
+import logging
+import time
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from typing import Any
+
+import sqlalchemy as sql
+
+from alembic import op
+
+# Under the alembic logger, which alembic.ini sets to report INFO
+logger = logging.getLogger("alembic.migrations")
+
+
+@contextmanager
+def timeouts(
+    *, lock_timeout: str | None = None, statement_timeout: str | None = None
+) -> Iterator[None]:
+    """
+    Fail statements that wait on a lock, or run, for longer than the given
+    Postgres intervals (such as "2s") instead of queueing every later writer
+    behind them.
+    """
+    settings = {"lock_timeout": lock_timeout, "statement_timeout": statement_timeout}
+    settings = {name: value for name, value in settings.items() if value is not None}
+    connection = op.get_bind()
+    previous = {name: connection.scalar(sql.text(f"SHOW {name}")) for name in settings}
+
+    for name, value in settings.items():
+        connection.execute(sql.select(sql.func.set_config(name, value, False)))
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            connection.execute(sql.select(sql.func.set_config(name, value, False)))
+
+
+def _drop_invalid_index(index_name: str) -> None:
+    # A failed concurrent build leaves an invalid index behind, which would
+    # otherwise satisfy IF NOT EXISTS on the next attempt
+    invalid = op.get_bind().scalar(
+        sql.text(
+            "SELECT NOT indisvalid FROM pg_index"
+            " WHERE indexrelid = to_regclass(:index_name)"
+        ),
+        {"index_name": index_name},
+    )
+
+    if invalid:
+        logger.info("Dropping invalid index %s left by an earlier attempt", index_name)
+        op.drop_index(index_name, postgresql_concurrently=True, if_exists=True)
+
+
+def create_index_concurrently(
+    index_name: str,
+    table_name: str,
+    columns: Sequence[str | sql.TextClause],
+    *,
+    lock_timeout: str = "5s",
+    **kwargs: Any,
+) -> None:
+    """
+    Build an index without blocking writes. It runs outside the migration's
+    transaction, so it can be retried after a failure.
+    """
+    with op.get_context().autocommit_block(), timeouts(lock_timeout=lock_timeout):
+        _drop_invalid_index(index_name)
+        op.create_index(
+            index_name,
+            table_name,
+            columns,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+            **kwargs,
+        )
+
+
+def drop_index_concurrently(
+    index_name: str, table_name: str, *, lock_timeout: str = "5s"
+) -> None:
+    with op.get_context().autocommit_block(), timeouts(lock_timeout=lock_timeout):
+        op.drop_index(
+            index_name,
+            table_name=table_name,
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+def backfill(
+    table_name: str,
+    set_clause: str,
+    pending: str,
+    *,
+    key: str = "id",
+    batch_size: int = 1000,
+    pause_seconds: float = 0.1,
+    lock_timeout: str = "2s",
+    statement_timeout: str = "30s",
+) -> int:
+    """
+    Apply set_clause to every row of the table matching pending, in batches
+    ordered by key that each commit on their own and are followed by a pause,
+    so that other transactions keep running in between.
+
+    pending must stop matching a row once it has been updated: a backfill
+    that is interrupted, or run again, then carries on where it left off.
+    """
+    connection = op.get_bind()
+
+    def batch(after: Any) -> sql.TextClause:
+        resume = "" if after is None else f"AND {key} > :after"
+        return sql.text(
+            f"""
+            WITH batch AS (
+                SELECT {key} FROM {table_name}
+                WHERE ({pending}) {resume}
+                ORDER BY {key}
+                LIMIT :batch_size
+            )
+            UPDATE {table_name} SET {set_clause}
+            FROM batch
+            WHERE {table_name}.{key} = batch.{key}
+            RETURNING {table_name}.{key}
+            """
+        )
+
+    updated = 0
+
+    with op.get_context().autocommit_block():
+        remaining = connection.scalar(
+            sql.text(f"SELECT count(*) FROM {table_name} WHERE {pending}")
+        )
+        logger.info("Backfilling %d rows of %s", remaining, table_name)
+        after = None
+
+        with timeouts(lock_timeout=lock_timeout, statement_timeout=statement_timeout):
+            while True:
+                parameters = {"batch_size": batch_size}
+                if after is not None:
+                    parameters["after"] = after
+
+                keys = connection.execute(batch(after), parameters).scalars().all()
+
+                if not keys:
+                    break
+
+                after = max(keys)
+                updated += len(keys)
+                logger.info(
+                    "Backfilled %d of %d rows of %s", updated, remaining, table_name
+                )
+                time.sleep(pause_seconds)
+
+    return updated
@@ -0,0 +1,229 @@
+import asyncio
+import datetime
+import logging
+import time
+
+import aiosmtplib
+import sqlalchemy as sql
+import tenacity
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core import config, db, emails
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxEmail(sql.orm.MappedAsDataclass, db.Base):
+    """
+    An email waiting to be delivered, or one that was dead-lettered after
+    running out of attempts.
+    """
+
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        sql.Index(
+            "ix_email_outbox_available_at",
+            "available_at",
+            postgresql_where=sql.text("dead_at IS NULL"),
+        ),
+    )
+
+    email_to: Mapped[str] = mapped_column(sql.String(255), nullable=False)
+    subject: Mapped[str] = mapped_column(sql.String, nullable=False)
+    html_content: Mapped[str] = mapped_column(sql.Text, nullable=False)
+    available_at: Mapped[datetime.datetime] = mapped_column(
+        sql.DateTime(timezone=True),
+        nullable=False,
+        server_default=sql.func.now(),
+        init=False,
+    )
+    attempts: Mapped[int] = mapped_column(sql.Integer, nullable=False, default=0)
+    last_error: Mapped[str | None] = mapped_column(sql.Text, default=None)
+    dead_at: Mapped[datetime.datetime | None] = mapped_column(
+        sql.DateTime(timezone=True), default=None
+    )
+    id: Mapped[int] = mapped_column(
+        sql.BigInteger, sql.Identity(), primary_key=True, init=False
+    )
+
+
+def enqueue(session: AsyncSession, email: emails.EmailData, email_to: str) -> None:
+    # Nothing delivers the queue without SMTP settings, so it would only grow
+    if not config.settings().emails_enabled:
+        logger.info("Emails are disabled, not sending %r", email.subject)
+        return
+
+    # Queued in the caller's transaction, so the email is only sent if it commits
+    session.add(
+        OutboxEmail(
+            email_to=email_to, subject=email.subject, html_content=email.html_content
+        )
+    )
+
+
+def _is_transient(error: BaseException) -> bool:
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+        return all(_is_transient(recipient) for recipient in error.recipients)
+
+    # Connection errors, timeouts and disconnects, including those the server
+    # answered on connecting, are worth retrying, but of other refusals only
+    # temporary ones
+    if isinstance(error, OSError):
+        return True
+
+    return (
+        isinstance(error, aiosmtplib.SMTPResponseException) and 400 <= error.code < 500
+    )
+
+
+async def _send(email: OutboxEmail) -> None:
+    settings = config.settings()
+
+    async for attempt in tenacity.AsyncRetrying(
+        retry=tenacity.retry_if_exception(_is_transient),
+        stop=tenacity.stop_after_attempt(settings.OUTBOX_SEND_ATTEMPTS),
+        wait=tenacity.wait_exponential(
+            multiplier=0.5, max=settings.OUTBOX_SEND_BACKOFF_MAX_SECONDS
+        ),
+        reraise=True,
+    ):
+        # SMTP_TIMEOUT_SECONDS bounds each command, this the whole attempt
+        with attempt:
+            async with asyncio.timeout(settings.SMTP_TIMEOUT_SECONDS):
+                await emails.send_email(
+                    emails.EmailData(
+                        html_content=email.html_content, subject=email.subject
+                    ),
+                    email.email_to,
+                )
+
+
+def _retry_delay(attempts: int) -> datetime.timedelta:
+    settings = config.settings()
+    return datetime.timedelta(
+        seconds=min(
+            settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1),
+            settings.OUTBOX_RETRY_MAX_SECONDS,
+        )
+    )
+
+
+async def _claim() -> list[OutboxEmail]:
+    settings = config.settings()
+
+    # Locked rows are skipped, so any number of workers across processes can
+    # claim at once without claiming an email twice. Claimed emails are leased
+    # rather than kept locked, so that no transaction stays open while sending
+    async with db.get_session(pin_to_primary=True) as session:
+        batch = (
+            await session.scalars(
+                sql.select(OutboxEmail)
+                .where(
+                    OutboxEmail.dead_at.is_(None),
+                    OutboxEmail.available_at <= sql.func.now(),
+                )
+                .order_by(OutboxEmail.available_at)
+                .limit(settings.OUTBOX_BATCH_SIZE)
+                .with_for_update(skip_locked=True)
+            )
+        ).all()
+
+        lease = datetime.timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+        for email in batch:
+            email.attempts += 1
+            email.available_at = datetime.datetime.now(datetime.UTC) + lease
+
+        await session.commit()
+
+    return list(batch)
+
+
+async def _record(
+    sent: list[int],
+    failed: list[tuple[OutboxEmail, Exception]],
+    released: list[int],
+) -> None:
+    settings = config.settings()
+
+    async with db.get_session(pin_to_primary=True) as session:
+        if sent:
+            await session.execute(
+                sql.delete(OutboxEmail).where(OutboxEmail.id.in_(sent))
+            )
+
+        if released:
+            # Never attempted, so they are due again straight away
+            await session.execute(
+                sql.update(OutboxEmail)
+                .where(OutboxEmail.id.in_(released))
+                .values(available_at=sql.func.now(), attempts=OutboxEmail.attempts - 1)
+            )
+
+        for email, error in failed:
+            now = datetime.datetime.now(datetime.UTC)
+
+            if (
+                not _is_transient(error)
+                or email.attempts >= settings.OUTBOX_MAX_ATTEMPTS
+            ):
+                values = {"last_error": repr(error), "dead_at": now}
+                logger.error("Dead-lettered email %s to %s", email.id, email.email_to)
+            else:
+                values = {
+                    "last_error": repr(error),
+                    "available_at": now + _retry_delay(email.attempts),
+                }
+
+            await session.execute(
+                sql.update(OutboxEmail)
+                .where(OutboxEmail.id == email.id)
+                .values(**values)
+            )
+
+        await session.commit()
+
+
+async def deliver_batch() -> int:
+    settings = config.settings()
+    batch = await _claim()
+    # Past this, an email might still be sending when its lease runs out and
+    # another worker claims it, so the rest of the batch is released instead
+    deadline = (
+        time.monotonic()
+        + settings.OUTBOX_LEASE_SECONDS
+        - settings.outbox_send_max_seconds
+    )
+    sent = []
+    failed = []
+    released = []
+
+    for email in batch:
+        if time.monotonic() >= deadline:
+            released.append(email.id)
+            continue
+
+        try:
+            await _send(email)
+        except Exception as e:
+            failed.append((email, e))
+        else:
+            sent.append(email.id)
+
+    if batch:
+        await _record(sent, failed, released)
+
+    return len(batch)
+
+
+async def deliver_periodically() -> None:
+    while True:
+        try:
+            delivered = await deliver_batch()
+        except Exception:
+            logger.exception("Failed to deliver queued emails")
+            delivered = 0
+
+        # A full batch suggests there is more waiting, so go straight on
+        if delivered < config.settings().OUTBOX_BATCH_SIZE:
+            await asyncio.sleep(config.settings().OUTBOX_POLL_SECONDS)
@@ -0,0 +1,198 @@
+import asyncio
+import datetime
+import logging
+import time
+import uuid
+from collections.abc import Callable
+from typing import Any
+
+import sqlalchemy as sql
+from jwt.exceptions import InvalidTokenError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core import config, db
+
+logger = logging.getLogger(__name__)
+
+
+class RevokedToken(InvalidTokenError):
+    pass
+
+
+class TokenRevocation(sql.orm.MappedAsDataclass, db.Base):
+    """
+    Either a single revoked token, identified by its jti, or every token issued
+    to a user before revoked_at.
+    """
+
+    __tablename__ = "token_revocations"
+
+    revoked_at: Mapped[datetime.datetime] = mapped_column(
+        sql.DateTime(timezone=True), nullable=False, index=True
+    )
+    expires_at: Mapped[datetime.datetime] = mapped_column(
+        sql.DateTime(timezone=True), nullable=False
+    )
+    jti: Mapped[uuid.UUID | None] = mapped_column(sql.Uuid, default=None)
+    # Not a foreign key, so that revoking a deleted user's tokens outlasts them
+    user_id: Mapped[uuid.UUID | None] = mapped_column(
+        sql.Uuid, default=None, index=True
+    )
+    id: Mapped[int] = mapped_column(
+        sql.BigInteger, sql.Identity(), primary_key=True, init=False
+    )
+
+
+# Revocations are held per worker as integer UUIDs mapped to POSIX timestamps:
+# jti -> token expiry, and user ID -> (revoked at, revocation expiry)
+_revoked_tokens: dict[int, float] = {}
+_revoked_users: dict[int, tuple[float, float]] = {}
+_refreshed_at: float | None = None
+# Rows are read again for this long after they are first seen, so that a
+# revocation committed late by a slow transaction is still picked up
+_REFRESH_OVERLAP_SECONDS = 300
+
+
+def is_revoked(claims: dict[str, Any]) -> bool:
+    if (jti := claims.get("jti")) and uuid.UUID(jti).int in _revoked_tokens:
+        return True
+
+    revoked_user = _revoked_users.get(uuid.UUID(claims["sub"]).int)
+    # Tokens issued before jti and iat claims were added are covered as well
+    return revoked_user is not None and claims.get("iat", 0) <= revoked_user[0]
+
+
+def check(claims: dict[str, Any]) -> None:
+    if is_revoked(claims):
+        raise RevokedToken("Token has been revoked")
+
+
+def _max_token_lifetime() -> datetime.timedelta:
+    settings = config.settings()
+    return datetime.timedelta(
+        minutes=max(
+            settings.ACCESS_TOKEN_EXPIRE_MINUTES,
+            settings.SELF_CONTAINED_ACCESS_TOKEN_EXPIRE_MINUTES,
+            settings.REFRESH_TOKEN_EXPIRE_MINUTES,
+        )
+    )
+
+
+# Revocations made through a session, which are only held in memory once the
+# session commits them
+_PENDING = "pending_revocations"
+
+
+@sql.event.listens_for(sql.orm.Session, "after_commit")
+def _apply_pending(session: sql.orm.Session) -> None:
+    for apply in session.info.pop(_PENDING, ()):
+        apply()
+
+
+@sql.event.listens_for(sql.orm.Session, "after_rollback")
+def _discard_pending(session: sql.orm.Session) -> None:
+    session.info.pop(_PENDING, None)
+
+
+def _on_commit(session: AsyncSession, apply: Callable[[], None]) -> None:
+    session.info.setdefault(_PENDING, []).append(apply)
+
+
+async def revoke_token(session: AsyncSession, jti: str, expires: float) -> None:
+    token_id = uuid.UUID(jti)
+    session.add(
+        TokenRevocation(
+            revoked_at=datetime.datetime.now(datetime.UTC),
+            expires_at=datetime.datetime.fromtimestamp(expires, datetime.UTC),
+            jti=token_id,
+        )
+    )
+
+    def apply() -> None:
+        _revoked_tokens[token_id.int] = expires
+
+    _on_commit(session, apply)
+
+
+async def revoke_user(session: AsyncSession, user_id: uuid.UUID) -> None:
+    revoked_at = datetime.datetime.now(datetime.UTC)
+    expires_at = revoked_at + _max_token_lifetime()
+    session.add(
+        TokenRevocation(revoked_at=revoked_at, expires_at=expires_at, user_id=user_id)
+    )
+
+    def apply() -> None:
+        _revoked_users[user_id.int] = (revoked_at.timestamp(), expires_at.timestamp())
+
+    _on_commit(session, apply)
+
+
+async def refresh(session: AsyncSession) -> None:
+    global _refreshed_at
+
+    started_at = time.time()
+    query = sql.select(
+        TokenRevocation.jti,
+        TokenRevocation.user_id,
+        TokenRevocation.revoked_at,
+        TokenRevocation.expires_at,
+    ).where(TokenRevocation.expires_at > sql.func.now())
+
+    if _refreshed_at is not None:
+        since = _refreshed_at - _REFRESH_OVERLAP_SECONDS
+        query = query.where(
+            TokenRevocation.revoked_at
+            >= datetime.datetime.fromtimestamp(since, datetime.UTC)
+        )
+
+    for row in await session.execute(query):
+        if row.jti is not None:
+            _revoked_tokens[row.jti.int] = row.expires_at.timestamp()
+        elif row.user_id is not None:
+            revoked_at = row.revoked_at.timestamp()
+            current = _revoked_users.get(row.user_id.int)
+            if current is None or current[0] < revoked_at:
+                _revoked_users[row.user_id.int] = (
+                    revoked_at,
+                    row.expires_at.timestamp(),
+                )
+
+    for jti, expires in list(_revoked_tokens.items()):
+        if expires <= started_at:
+            del _revoked_tokens[jti]
+
+    for user_id, (_, expires) in list(_revoked_users.items()):
+        if expires <= started_at:
+            del _revoked_users[user_id]
+
+    _refreshed_at = started_at
+
+
+async def purge_expired(session: AsyncSession) -> None:
+    await session.execute(
+        sql.delete(TokenRevocation).where(TokenRevocation.expires_at <= sql.func.now())
+    )
+
+
+async def refresh_periodically() -> None:
+    purged_at: float | None = None
+
+    while True:
+        try:
+            async with db.get_session() as session:
+                await refresh(session)
+                # Expired rows are harmless until then, as refresh skips them
+                settings = config.settings()
+                if (
+                    purged_at is None
+                    or time.monotonic() - purged_at
+                    >= settings.TOKEN_REVOCATION_PURGE_SECONDS
+                ):
+                    await purge_expired(session)
+                    await session.commit()
+                    purged_at = time.monotonic()
+        except Exception:
+            logger.exception("Failed to refresh token revocations")
+
+        await asyncio.sleep(config.settings().TOKEN_REVOCATION_REFRESH_SECONDS)
@@ -1,3 +1,15 @@
+import asyncio
+import contextlib
+import multiprocessing
+import uuid
+from collections.abc import Callable, Sequence
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from dataclasses import dataclass
 from datetime import UTC, datetime, timedelta
 from typing import Any
 
@@ -6,22 +18,58 @@ from jwt.exceptions import InvalidTokenError
 from passlib.context import CryptContext
 
 from app.core import config
+from app.core.exceptions import Overloaded
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+_bcrypt_rounds = config.settings().BCRYPT_ROUNDS
+# Pinning the minimum and maximum to the configured cost makes needs_update
+# flag hashes made with any other cost, so they are rehashed on login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=_bcrypt_rounds,
+    bcrypt__min_rounds=_bcrypt_rounds,
+    bcrypt__max_rounds=_bcrypt_rounds,
+)
 
 
 ALGORITHM = "HS256"
 
 
-def create_access_token(subject: Any, expires_delta: timedelta) -> str:
-    expire = datetime.now(UTC) + expires_delta
-    to_encode: dict[str, Any] = {"exp": expire, "sub": str(subject)}
+REFRESH_TOKEN_TYPE = "refresh"
+
+
+def create_access_token(
+    subject: Any,
+    expires_delta: timedelta,
+    claims: dict[str, Any] | None = None,
+    jti: str | None = None,
+) -> str:
+    now = datetime.now(UTC)
+    to_encode: dict[str, Any] = {
+        **(claims or {}),
+        "exp": now + expires_delta,
+        # A fractional iat lets revocations tell apart tokens issued in the same second
+        "iat": now.timestamp(),
+        "jti": jti or uuid.uuid4().hex,
+        "sub": str(subject),
+    }
     encoded_jwt = jwt.encode(
         to_encode, config.settings().SECRET_KEY, algorithm=ALGORITHM
     )
     return encoded_jwt
 
 
+def create_refresh_token(
+    subject: Any, expires_delta: timedelta, version: int, jti: str | None = None
+) -> str:
+    return create_access_token(
+        subject,
+        expires_delta,
+        claims={"typ": REFRESH_TOKEN_TYPE, "ver": version},
+        jti=jti,
+    )
+
+
 def create_password_reset_token(sub: str) -> str:
     settings = config.settings()
     now = datetime.now(UTC)
@@ -33,9 +81,30 @@ def create_password_reset_token(sub: str) -> str:
     return a
 
 
+def decode_access_token_claims(token: str) -> dict[str, Any]:
+    claims: dict[str, Any] = jwt.decode(
+        token, config.settings().SECRET_KEY, algorithms=[ALGORITHM]
+    )
+
+    if claims.get("typ") == REFRESH_TOKEN_TYPE:
+        raise InvalidTokenError("Refresh tokens cannot be used for authentication")
+
+    return claims
+
+
 def decode_access_token(token: str) -> Any | None:
-    payload = jwt.decode(token, config.settings().SECRET_KEY, algorithms=[ALGORITHM])
-    return payload.get("sub")
+    return decode_access_token_claims(token).get("sub")
+
+
+def decode_refresh_token(token: str) -> dict[str, Any]:
+    claims: dict[str, Any] = jwt.decode(
+        token, config.settings().SECRET_KEY, algorithms=[ALGORITHM]
+    )
+
+    if claims.get("typ") != REFRESH_TOKEN_TYPE:
+        raise InvalidTokenError("Not a refresh token")
+
+    return claims
 
 
 def decode_password_reset_token(token: str) -> str | None:
@@ -51,5 +120,143 @@ def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
 
+def hash_passwords(passwords: Sequence[str]) -> list[str]:
+    return [pwd_context.hash(password) for password in passwords]
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
+
+
+def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, str | None]:
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+@dataclass
+class HashingPoolStats:
+    workers: int
+    max_queue: int
+    in_flight: int
+    queued: int
+    completed: int
+    rejected: int
+
+
+@dataclass
+class _HashingCounters:
+    pending: int = 0
+    completed: int = 0
+    rejected: int = 0
+
+
+_hashing_executor: Executor | None = None
+_hashing_counters = _HashingCounters()
+
+
+def _get_hashing_executor() -> Executor:
+    global _hashing_executor
+
+    if _hashing_executor is None:
+        settings = config.settings()
+        if settings.PASSWORD_HASHING_EXECUTOR == "process":
+            _hashing_executor = ProcessPoolExecutor(
+                settings.PASSWORD_HASHING_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        else:
+            _hashing_executor = ThreadPoolExecutor(
+                settings.PASSWORD_HASHING_WORKERS,
+                thread_name_prefix="password-hashing",
+            )
+
+    return _hashing_executor
+
+
+async def _run_hashing[T](fn: Callable[..., T], *args: Any) -> T:
+    settings = config.settings()
+    capacity = settings.PASSWORD_HASHING_WORKERS + settings.PASSWORD_HASHING_MAX_QUEUE
+
+    if _hashing_counters.pending >= capacity:
+        _hashing_counters.rejected += 1
+        raise Overloaded("Too many password hashing requests in progress")
+
+    loop = asyncio.get_running_loop()
+    future = _get_hashing_executor().submit(fn, *args)
+    _hashing_counters.pending += 1
+
+    def release(future: Future[T]) -> None:
+        _hashing_counters.pending -= 1
+        if not future.cancelled() and future.exception() is None:
+            _hashing_counters.completed += 1
+
+    # The job keeps its slot until it is done, even if whoever awaited it was
+    # cancelled, as it keeps running in the executor regardless. Called from
+    # the executor's threads, so the counters are updated on the loop's
+    def on_done(future: Future[T]) -> None:
+        # Unless the loop is already closed, when shutting down
+        with contextlib.suppress(RuntimeError):
+            loop.call_soon_threadsafe(release, future)
+
+    future.add_done_callback(on_done)
+    return await asyncio.wrap_future(future)
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_hashing(hash_password, password)
+
+
+# Passwords per job when hashing in bulk, so that hashes for logins wait behind
+# a handful of bulk hashes rather than all of them
+_BULK_HASHING_CHUNK_SIZE = 8
+
+
+async def hash_passwords_async(passwords: Sequence[str]) -> list[str]:
+    passwords = list(passwords)
+    workers = asyncio.Semaphore(config.settings().PASSWORD_HASHING_WORKERS)
+
+    async def hash_chunk(chunk: list[str]) -> list[str]:
+        async with workers:
+            return await _run_hashing(hash_passwords, chunk)
+
+    hashed = await asyncio.gather(
+        *(
+            hash_chunk(passwords[i : i + _BULK_HASHING_CHUNK_SIZE])
+            for i in range(0, len(passwords), _BULK_HASHING_CHUNK_SIZE)
+        )
+    )
+    return [password for chunk in hashed for password in chunk]
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_hashing(verify_password, plain_password, hashed_password)
+
+
+async def verify_and_update_password_async(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, str | None]:
+    return await _run_hashing(
+        verify_and_update_password, plain_password, hashed_password
+    )
+
+
+def hashing_pool_stats() -> HashingPoolStats:
+    settings = config.settings()
+    workers = settings.PASSWORD_HASHING_WORKERS
+    return HashingPoolStats(
+        workers=workers,
+        max_queue=settings.PASSWORD_HASHING_MAX_QUEUE,
+        in_flight=min(_hashing_counters.pending, workers),
+        queued=max(_hashing_counters.pending - workers, 0),
+        completed=_hashing_counters.completed,
+        rejected=_hashing_counters.rejected,
+    )
+
+
+def shutdown_hashing_pool() -> None:
+    global _hashing_executor
+
+    if _hashing_executor is not None:
+        _hashing_executor.shutdown(wait=False, cancel_futures=True)
+        _hashing_executor = None
@@ -0,0 +1,123 @@
+import datetime
+import uuid
+from collections.abc import Callable, Sequence
+from typing import Any, Literal, get_args
+
+import sqlalchemy as sql
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core import config, db
+from app.core.users import Principal, User
+
+Sport = Literal["windsurfing", "wingfoiling"]
+PowerLevel = Literal["underpowered", "wellpowered", "overpowered"]
+
+
+class WindSession(sql.orm.MappedAsDataclass, db.Base):
+    """
+    A session on the water, with the wind observed during each hour of it.
+
+    Observations are stored as parallel arrays on the session itself, the
+    first entry being the hour in which the session started, so a session and
+    all its observations are a single row.
+    """
+
+    __tablename__ = "sessions"
+    __table_args__ = (
+        # Serves listing a user's sessions, and deleting them with the user
+        sql.Index("ix_sessions_user_id_date", "user_id", "date", "id"),
+    )
+
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        sql.ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    date: Mapped[datetime.date] = mapped_column(sql.Date, nullable=False)
+    start_time: Mapped[datetime.time] = mapped_column(sql.Time, nullable=False)
+    end_time: Mapped[datetime.time] = mapped_column(sql.Time, nullable=False)
+    location: Mapped[str] = mapped_column(sql.String(255), nullable=False)
+    sport: Mapped[Sport] = mapped_column(
+        sql.Enum(*get_args(Sport), name="sport"), nullable=False
+    )
+    equipment: Mapped[str] = mapped_column(sql.String(255), nullable=False)
+    power_level: Mapped[PowerLevel] = mapped_column(
+        sql.Enum(*get_args(PowerLevel), name="power_level"), nullable=False
+    )
+    # Missing readings are NULL elements
+    average_speed_kts: Mapped[list[float | None]] = mapped_column(
+        postgresql.ARRAY(sql.REAL), nullable=False, default_factory=list
+    )
+    gust_speed_kts: Mapped[list[float | None]] = mapped_column(
+        postgresql.ARRAY(sql.REAL), nullable=False, default_factory=list
+    )
+    direction_degrees: Mapped[list[int | None]] = mapped_column(
+        postgresql.ARRAY(sql.SmallInteger), nullable=False, default_factory=list
+    )
+    id: Mapped[uuid.UUID] = db.uuid_primary_key()
+
+
+def _readings[T](
+    observations: Sequence[dict[str, Any]], key: str, to: Callable[[Any], T]
+) -> list[T | None]:
+    # psycopg only dumps arrays whose elements all have the same Python type
+    return [None if o.get(key) is None else to(o[key]) for o in observations]
+
+
+def _to_row(user_id: uuid.UUID, new_session: dict[str, Any]) -> dict[str, Any]:
+    observations = new_session.get("observations", ())
+    return {
+        "id": db.uuid7(),
+        "user_id": user_id,
+        "date": new_session["date"],
+        "start_time": new_session["start_time"],
+        "end_time": new_session["end_time"],
+        "location": new_session["location"],
+        "sport": new_session["sport"],
+        "equipment": new_session["equipment"],
+        "power_level": new_session["power_level"],
+        "average_speed_kts": _readings(observations, "average_speed_kts", float),
+        "gust_speed_kts": _readings(observations, "gust_speed_kts", float),
+        "direction_degrees": _readings(observations, "direction_degrees", int),
+    }
+
+
+async def create_many(
+    session: AsyncSession,
+    current_user: User | Principal,
+    new_sessions: Sequence[dict[str, Any]],
+) -> list[uuid.UUID]:
+    """
+    Record sessions of the current user, each with its hourly observations,
+    and return their IDs in the order they were given.
+    """
+    rows = [_to_row(current_user.id, new_session) for new_session in new_sessions]
+    batch_size = config.settings().SESSIONS_BULK_INSERT_BATCH_SIZE
+
+    for start in range(0, len(rows), batch_size):
+        # One multi-row statement per batch, with IDs made here rather than
+        # returned by the database
+        await session.execute(
+            sql.insert(WindSession).values(rows[start : start + batch_size])
+        )
+
+    return [row["id"] for row in rows]
+
+
+async def get_all(
+    session: AsyncSession,
+    current_user: User | Principal,
+    cursor: str | None = None,
+    count: int = 50,
+) -> db.Page[WindSession]:
+    """
+    Paginate through the current user's sessions, the most recent first.
+    """
+    return await db.keyset_paginate(
+        session,
+        sql.select(WindSession).where(WindSession.user_id == current_user.id),
+        (WindSession.date, WindSession.id),
+        count,
+        cursor,
+        descending=True,
+    )
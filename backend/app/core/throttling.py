@@ -0,0 +1,77 @@
+import time
+from collections import OrderedDict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from app.core.exceptions import RateLimited
+
+
+@dataclass
+class _Window:
+    start: float
+    current: int = 0
+    previous: int = 0
+
+
+class SlidingWindowLimiter:
+    """
+    Allows at most `limit` attempts per key in any `window` seconds.
+
+    The sliding window is approximated from two fixed windows, weighting the
+    previous window's count by how much of it the sliding window still covers,
+    so each check is O(1). The least recently seen keys are evicted beyond
+    `max_keys`.
+    """
+
+    def __init__(self, limit: int, window: float, max_keys: int) -> None:
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._windows: OrderedDict[str, _Window] = OrderedDict()
+
+    def acquire(self, key: str) -> None:
+        now = time.monotonic()
+        start = now - now % self.window
+        window = self._windows.get(key)
+
+        if window is None or window.start < start - self.window:
+            window = _Window(start)
+        elif window.start < start:
+            window = _Window(start, previous=window.current)
+
+        self._windows[key] = window
+        self._windows.move_to_end(key)
+        while len(self._windows) > self.max_keys:
+            self._windows.popitem(last=False)
+
+        elapsed = (now - start) / self.window
+        if window.previous * (1 - elapsed) + window.current >= self.limit:
+            raise RateLimited(self._retry_after(window, now))
+
+        window.current += 1
+
+    def _retry_after(self, window: _Window, now: float) -> float:
+        if window.current < self.limit and window.previous:
+            # When enough of the previous window will have slid out
+            elapsed = 1 - (self.limit - window.current) / window.previous
+            return window.start + elapsed * self.window - now
+
+        return window.start + self.window - now
+
+
+class ConcurrencyLimiter:
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.in_flight = 0
+
+    @contextmanager
+    def acquire(self) -> Iterator[None]:
+        if self.in_flight >= self.limit:
+            raise RateLimited(1)
+
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
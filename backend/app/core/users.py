@@ -1,30 +1,199 @@
 import datetime
+import hashlib
+import math
+import time
 import uuid
-from typing import Any
+from collections.abc import AsyncIterator, Sequence
+from dataclasses import dataclass
+from typing import Any, Literal
 
 import sqlalchemy as sql
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Mapped, mapped_column
 
-from app.core import config, db, emails, security
+from app.core import (
+    cache,
+    config,
+    db,
+    emails,
+    outbox,
+    revocations,
+    security,
+    throttling,
+)
 from app.core.exceptions import AlreadyExists, DoesNotExist, Unauthorized
 
 
 class User(sql.orm.MappedAsDataclass, db.Base):
     __tablename__ = "users"
 
-    email: Mapped[str] = mapped_column(sql.String(255), nullable=False, unique=True)
+    email: Mapped[str] = mapped_column(sql.String(255), nullable=False)
     name: Mapped[str] = mapped_column(sql.String(255), nullable=False)
     hashed_password: Mapped[str] = mapped_column(sql.String, nullable=False)
-    id: Mapped[uuid.UUID] = mapped_column(
-        sql.Uuid, primary_key=True, default_factory=uuid.uuid4
-    )
+    id: Mapped[uuid.UUID] = db.uuid_primary_key()
     admin: Mapped[bool] = mapped_column(sql.Boolean, nullable=False, default=False)
+    # Incremented whenever the user changes, so that claims cached in
+    # self-contained access tokens can be told apart from current ones
+    version: Mapped[int] = mapped_column(sql.Integer, nullable=False, default=1)
+
+
+# Emails are unique regardless of case. The included columns let logins be
+# answered from the index alone; email is among them because Postgres only
+# considers an index-only scan when the expression's column is in the index
+sql.Index(
+    "ix_users_lower_email",
+    sql.func.lower(User.email),
+    unique=True,
+    postgresql_include=["email", "id", "hashed_password"],
+)
+
+
+def _email_matches(email: str) -> sql.ColumnElement[bool]:
+    return sql.func.lower(User.email) == sql.func.lower(email)
+
+
+def _credentials(email: str) -> sql.Select[tuple[uuid.UUID, str]]:
+    return sql.select(User.id, User.hashed_password).where(_email_matches(email))
+
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    A user's identity and permissions, as described by the claims of an access
+    token or read from the users table. Immutable, so that one can be cached
+    and shared between requests.
+    """
+
+    id: uuid.UUID
+    email: str
+    name: str
+    admin: bool
+    version: int
+
+
+@dataclass
+class CreateResult:
+    email: str
+    status: Literal["created", "duplicate"]
+    id: uuid.UUID | None = None
+
+
+@dataclass
+class LookupResult:
+    id: uuid.UUID
+    status: Literal["found", "missing", "forbidden"]
+    user: User | None = None
+
+
+@dataclass
+class Tokens:
+    access_token: str
+    refresh_token: str | None = None
+
+
+_settings = config.settings()
+# Access token claims and the users they resolve to, keyed by the token's
+# SHA-256 digest
+_principals = cache.TTLCache[bytes, tuple[dict[str, Any], Principal]](
+    _settings.PRINCIPAL_CACHE_MAX_SIZE, _settings.PRINCIPAL_CACHE_TTL_SECONDS
+)
+
+# Concurrent lookups of the same user in this worker share one query
+_lookups = cache.SingleFlight[uuid.UUID, Principal | None]()
+
+_login_attempts_by_email = throttling.SlidingWindowLimiter(
+    _settings.LOGIN_ATTEMPTS_PER_EMAIL,
+    _settings.LOGIN_ATTEMPT_WINDOW_SECONDS,
+    _settings.LOGIN_THROTTLE_MAX_KEYS,
+)
+_login_attempts_by_client = throttling.SlidingWindowLimiter(
+    _settings.LOGIN_ATTEMPTS_PER_CLIENT,
+    _settings.LOGIN_ATTEMPT_WINDOW_SECONDS,
+    _settings.LOGIN_THROTTLE_MAX_KEYS,
+)
+_login_verifies = throttling.ConcurrencyLimiter(_settings.LOGIN_MAX_CONCURRENT_VERIFIES)
+
+
+def principal_cache_stats() -> cache.CacheStats:
+    return _principals.stats()
+
+
+async def _fetch(session: AsyncSession, user_id: uuid.UUID) -> Principal | None:
+    row = (
+        await session.execute(
+            sql.select(User.id, User.email, User.name, User.admin, User.version).where(
+                User.id == user_id
+            )
+        )
+    ).first()
+
+    return _to_principal(row) if row else None
+
+
+async def _lookup(session: AsyncSession, user_id: uuid.UUID) -> Principal | None:
+    # Reads that must observe the session's own writes cannot be shared
+    if session.info.get(db.PINNED_TO_PRIMARY):
+        return await _fetch(session, user_id)
+
+    # Runs in the session of whichever request asked first, which waits for it
+    # like every other, and shares an immutable Principal rather than a User
+    # bound to that session
+    return await _lookups.do(user_id, lambda: _fetch(session, user_id))
+
+
+def _to_principal(user: User | sql.Row[Any]) -> Principal:
+    return Principal(
+        id=user.id,
+        email=user.email,
+        name=user.name,
+        admin=user.admin,
+        version=user.version,
+    )
+
+
+def _issue_tokens(principal: Principal) -> Tokens:
+    settings = config.settings()
+
+    if not settings.SELF_CONTAINED_TOKENS:
+        return Tokens(
+            access_token=security.create_access_token(
+                principal.id,
+                datetime.timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
+            )
+        )
+
+    # The access token names its refresh token, so that logging out with the
+    # former revokes the latter as well
+    refresh_jti = uuid.uuid4().hex
+    refresh_expires_delta = datetime.timedelta(
+        minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES
+    )
+
+    return Tokens(
+        access_token=security.create_access_token(
+            principal.id,
+            datetime.timedelta(
+                minutes=settings.SELF_CONTAINED_ACCESS_TOKEN_EXPIRE_MINUTES
+            ),
+            claims={
+                "email": principal.email,
+                "name": principal.name,
+                "admin": principal.admin,
+                "ver": principal.version,
+                "rti": refresh_jti,
+                "rexp": math.ceil(time.time() + refresh_expires_delta.total_seconds()),
+            },
+        ),
+        refresh_token=security.create_refresh_token(
+            principal.id, refresh_expires_delta, principal.version, jti=refresh_jti
+        ),
+    )
 
 
 async def create(
     session: AsyncSession,
-    current_user: User,
+    current_user: User | Principal,
     *,
     name: str,
     email: str,
@@ -37,7 +206,7 @@ async def create(
     user = User(
         name=name,
         email=email,
-        hashed_password=security.hash_password(password),
+        hashed_password=await security.hash_password_async(password),
         admin=admin,
     )
     try:
@@ -48,26 +217,119 @@ async def create(
     return user
 
 
-async def create_token(session: AsyncSession, email: str, password: str) -> str:
-    row = (
-        await session.execute(
-            sql.select(User.id, User.hashed_password).where(User.email == email)
+async def create_many(
+    session: AsyncSession,
+    current_user: User | Principal,
+    new_users: Sequence[dict[str, Any]],
+) -> list[CreateResult]:
+    if not current_user.admin:
+        raise Unauthorized()
+
+    results = [
+        CreateResult(email=new_user["email"], status="duplicate")
+        for new_user in new_users
+    ]
+    batch_size = config.settings().USERS_BULK_INSERT_BATCH_SIZE
+
+    for start in range(0, len(new_users), batch_size):
+        batch = range(start, min(start + batch_size, len(new_users)))
+        emails = [new_users[i]["email"].lower() for i in batch]
+        existing = set(
+            await session.scalars(
+                sql.select(sql.func.lower(User.email)).where(
+                    sql.func.lower(User.email).in_(emails)
+                )
+            )
         )
-    ).first()
 
-    if not row:
-        raise DoesNotExist()
+        # Only the first of any repeated email is inserted, and nothing that
+        # already exists is hashed
+        pending = []
+        for i in batch:
+            if (email := results[i].email.lower()) not in existing:
+                existing.add(email)
+                pending.append(i)
 
-    if not security.verify_password(password, row.hashed_password):
-        raise Unauthorized()
+        if not pending:
+            continue
 
-    return security.create_access_token(
-        row.id,
-        datetime.timedelta(minutes=config.settings().ACCESS_TOKEN_EXPIRE_MINUTES),
-    )
+        hashed_passwords = await security.hash_passwords_async(
+            [new_users[i]["password"] for i in pending]
+        )
+        rows = [
+            {
+                "id": db.uuid7(),
+                "email": new_users[i]["email"],
+                "name": new_users[i]["name"],
+                "hashed_password": hashed_password,
+                "admin": new_users[i].get("admin", False),
+                "version": 1,
+            }
+            for i, hashed_password in zip(pending, hashed_passwords, strict=True)
+        ]
+        # Users created concurrently since the lookup are reported as duplicates
+        result = await session.execute(
+            postgresql.insert(User)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=[sql.func.lower(User.email)])
+            .returning(sql.func.lower(User.email), User.id)
+        )
+        # A list, as dict() would take the Result itself for a mapping
+        created = dict(result.tuples().all())
 
+        for i in pending:
+            if (user_id := created.get(results[i].email.lower())) is not None:
+                results[i].status = "created"
+                results[i].id = user_id
 
-async def delete(session: AsyncSession, current_user: User, user_id: uuid.UUID) -> None:
+    return results
+
+
+async def create_token(
+    session: AsyncSession, email: str, password: str, client: str | None = None
+) -> Tokens:
+    _login_attempts_by_email.acquire(email.lower())
+    if client:
+        _login_attempts_by_client.acquire(client)
+
+    # Answered by an index-only scan, so failed logins never touch the table
+    credentials = (await session.execute(_credentials(email))).first()
+
+    if not credentials:
+        raise DoesNotExist()
+
+    with _login_verifies.acquire():
+        verified, new_hash = await security.verify_and_update_password_async(
+            password, credentials.hashed_password
+        )
+
+    if not verified:
+        raise Unauthorized()
+
+    if new_hash:
+        row = (
+            await session.execute(
+                sql.update(User)
+                .where(User.id == credentials.id)
+                .values(hashed_password=new_hash)
+                .returning(User.id, User.email, User.name, User.admin, User.version)
+            )
+        ).one()
+    else:
+        row = (
+            await session.execute(
+                sql.select(
+                    User.id, User.email, User.name, User.admin, User.version
+                ).where(User.id == credentials.id)
+            )
+        ).one()
+
+    return _issue_tokens(_to_principal(row))
+
+
+async def delete(
+    session: AsyncSession, current_user: User | Principal, user_id: uuid.UUID
+) -> None:
     if not current_user.admin and not current_user.id == user_id:
         raise Unauthorized()
 
@@ -76,10 +338,35 @@ async def delete(session: AsyncSession, current_user: User, user_id: uuid.UUID)
     except sql.exc.IntegrityError:
         raise DoesNotExist(f"User with ID {user_id} does not exist")
 
+    # Self-contained tokens are accepted without reading the users table
+    await revocations.revoke_user(session, user_id)
+    _principals.discard_where(lambda cached: cached[1].id == user_id)
+
+
+def export(current_user: User | Principal) -> AsyncIterator[Sequence[sql.Row[Any]]]:
+    if not current_user.admin:
+        raise Unauthorized()
+
+    return _export()
+
+
+async def _export() -> AsyncIterator[Sequence[sql.Row[Any]]]:
+    # The export is consumed while the response streams, after the request's
+    # own session has been closed, so it reads through a session of its own
+    async with db.get_session() as session:
+        result = await session.stream(
+            sql.select(User.id, User.email, User.name, User.admin)
+            .order_by(User.id)
+            .execution_options(yield_per=config.settings().USERS_EXPORT_BATCH_SIZE)
+        )
+
+        async for rows in result.partitions():
+            yield rows
+
 
 async def get_all(
     session: AsyncSession,
-    current_user: User,
+    current_user: User | Principal,
     cursor: str | None = None,
     count: int = 50,
 ) -> db.Page[User]:
@@ -87,40 +374,153 @@ async def get_all(
         raise Unauthorized()
 
     return await db.keyset_paginate(
-        session, sql.select(User).order_by(User.id), count, cursor
+        session, sql.select(User), (User.id,), count, cursor
     )
 
 
-async def get_from_token(session: AsyncSession, token: str) -> User:
-    user_id = uuid.UUID(security.decode_access_token(token))
-    user = await session.scalar(sql.select(User).where(User.id == user_id))
+async def get_from_token(session: AsyncSession, token: str) -> Principal:
+    cache_enabled = config.settings().PRINCIPAL_CACHE_ENABLED
+    key = hashlib.sha256(token.encode()).digest()
 
-    if not user:
+    if cache_enabled and (cached := _principals.get(key)) is not None:
+        claims, user = cached
+        revocations.check(claims)
+        return user
+
+    claims = security.decode_access_token_claims(token)
+    revocations.check(claims)
+    principal = await _lookup(session, uuid.UUID(claims["sub"]))
+
+    if not principal:
         raise DoesNotExist()
 
-    return user
+    if cache_enabled:
+        _principals.put(key, (claims, principal), ttl=claims["exp"] - time.time())
+
+    return principal
+
+
+async def get_many(
+    session: AsyncSession, current_user: User | Principal, user_ids: Sequence[uuid.UUID]
+) -> list[LookupResult]:
+    # The same rule as get_one, applied per user instead of failing outright
+    allowed = {
+        user_id
+        for user_id in user_ids
+        if current_user.admin or current_user.id == user_id
+    }
+    found = {}
+
+    if allowed:
+        found = {
+            user.id: user
+            for user in await session.scalars(
+                sql.select(User).where(
+                    User.id
+                    == sql.any_(
+                        sql.bindparam(
+                            "user_ids", list(allowed), type_=postgresql.ARRAY(sql.Uuid)
+                        )
+                    )
+                )
+            )
+        }
+
+    return [
+        LookupResult(id=user_id, status="found", user=found[user_id])
+        if user_id in found
+        else LookupResult(
+            id=user_id, status="missing" if user_id in allowed else "forbidden"
+        )
+        for user_id in user_ids
+    ]
 
 
 async def get_one(
-    session: AsyncSession, current_user: User, user_id: uuid.UUID
-) -> User | None:
+    session: AsyncSession, current_user: User | Principal, user_id: uuid.UUID
+) -> Principal | None:
+    if not current_user.admin and current_user.id != user_id:
+        raise Unauthorized()
+
+    return await _lookup(session, user_id)
+
+
+async def get_version(
+    session: AsyncSession, current_user: User | Principal, user_id: uuid.UUID
+) -> int | None:
     if not current_user.admin and current_user.id != user_id:
         raise Unauthorized()
 
-    return await session.scalar(sql.select(User).where(User.id == user_id))
+    result = await session.execute(sql.select(User.version).where(User.id == user_id))
+    return result.scalar_one_or_none()
+
+
+async def get_principal_from_token(session: AsyncSession, token: str) -> Principal:
+    if config.settings().SELF_CONTAINED_TOKENS:
+        claims = security.decode_access_token_claims(token)
+
+        # Tokens issued before self-contained tokens were enabled carry no claims
+        if "ver" in claims:
+            revocations.check(claims)
+            return Principal(
+                id=uuid.UUID(claims["sub"]),
+                email=claims["email"],
+                name=claims["name"],
+                admin=claims["admin"],
+                version=claims["ver"],
+            )
+
+    return await get_from_token(session, token)
+
+
+async def logout(session: AsyncSession, token: str) -> None:
+    claims = security.decode_access_token_claims(token)
+
+    if "jti" in claims:
+        await revocations.revoke_token(session, claims["jti"], claims["exp"])
+        if "rti" in claims:
+            await revocations.revoke_token(session, claims["rti"], claims["rexp"])
+    else:
+        # Tokens issued before jti claims were added can only be revoked together
+        await revocations.revoke_user(session, uuid.UUID(claims["sub"]))
+
+
+async def logout_everywhere(
+    session: AsyncSession, current_user: User | Principal
+) -> None:
+    await revocations.revoke_user(session, current_user.id)
+    _principals.discard_where(lambda cached: cached[1].id == current_user.id)
+
+
+async def refresh_tokens(session: AsyncSession, refresh_token: str) -> Tokens:
+    claims = security.decode_refresh_token(refresh_token)
+    revocations.check(claims)
+    user = await session.scalar(
+        sql.select(User).where(User.id == uuid.UUID(claims["sub"]))
+    )
+
+    if not user:
+        raise DoesNotExist()
+
+    # Changing the user, such as resetting their password, retires its tokens
+    if claims["ver"] != user.version:
+        raise Unauthorized()
+
+    return _issue_tokens(_to_principal(user))
 
 
 async def request_password_reset(session: AsyncSession, email: str) -> None:
-    exists = await session.scalar(
-        sql.select(sql.exists(User).where(User.email == email))
+    # The address is sent to as stored, whatever case it was requested in
+    stored_email = await session.scalar(
+        sql.select(User.email).where(_email_matches(email))
     )
 
-    if not exists:
+    if stored_email is None:
         raise DoesNotExist()
 
+    email = stored_email
     token = security.create_password_reset_token(email)
-    email_data = emails.render_reset_password_email(email, token)
-    await emails.send_email(email_data, email)
+    outbox.enqueue(session, emails.render_reset_password_email(email, token), email)
 
 
 async def reset_password(session: AsyncSession, token: str, password: str) -> None:
@@ -129,25 +529,39 @@ async def reset_password(session: AsyncSession, token: str, password: str) -> No
     if not email:
         raise ValueError("Invalid token")
 
-    result = await session.execute(
+    user_id = await session.scalar(
         sql.update(User)
-        .where(User.email == email)
-        .values(hashed_password=security.hash_password(password))
+        .returning(User.id)
+        .where(_email_matches(email))
+        .values(
+            hashed_password=await security.hash_password_async(password),
+            version=User.version + 1,
+        )
     )
 
-    if result.rowcount == 0:
+    if user_id is None:
         raise DoesNotExist()
 
+    # Whoever requested the reset may not be the only one holding a token
+    await revocations.revoke_user(session, user_id)
+    _principals.discard_where(lambda cached: cached[1].id == user_id)
+
 
 async def update(
     session: AsyncSession,
-    current_user: User,
+    current_user: User | Principal,
     user_id: uuid.UUID,
     values: dict[str, Any],
 ) -> User | None:
     if not current_user.admin or current_user.id != user_id:
         raise Unauthorized()
 
-    return await session.scalar(
-        sql.update(User).returning(User).where(User.id == user_id).values(**values)
+    user = await session.scalar(
+        sql.update(User)
+        .returning(User)
+        .where(User.id == user_id)
+        .values(**values, version=User.version + 1)
     )
+    _principals.discard_where(lambda cached: cached[1].id == user_id)
+
+    return user
@@ -0,0 +1,252 @@
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+import sqlalchemy as sql
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.sessions import PowerLevel, Sport, WindSession
+from app.core.users import Principal, User
+
+type Column = npt.NDArray[np.float64]
+
+
+@dataclass
+class WindStats:
+    observations: int
+    mean_speed_kts: float | None
+    max_speed_kts: float | None
+    max_gust_kts: float | None
+    # The mean ratio of gust to average speed, over hours that have both
+    gust_factor: float | None
+    mean_direction_degrees: float | None
+    # Between 0 when the wind kept one direction and 1 when it had none
+    direction_variance: float | None
+    # Hours of observations by sport, then by how powered the rider was
+    hours_by_power_level: dict[Sport, dict[PowerLevel, int]] = field(
+        default_factory=dict
+    )
+
+
+@dataclass
+class WindSummary:
+    overall: WindStats
+    locations: dict[str, WindStats]
+
+
+@dataclass
+class ObservationGroup:
+    location: str
+    sport: Sport
+    power_level: PowerLevel
+    observations: int
+
+
+# Directions are whole degrees. The extra zero is where missing directions,
+# stored as -1, land, so they add nothing to the sums.
+_SIN = np.append(np.sin(np.deg2rad(np.arange(360))), 0)
+_COS = np.append(np.cos(np.deg2rad(np.arange(360))), 0)
+
+
+def _optional(value: np.float64) -> float | None:
+    return None if np.isnan(value) else float(value)
+
+
+def _to_stats(observations: int, sums: Column, maxima: Column) -> WindStats:
+    speeds, speed_total, gusts, ratio_total, headings, sin, cos = sums
+
+    # Statistics without any readings come out as NaN, and are reported as None
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return WindStats(
+            observations=observations,
+            mean_speed_kts=_optional(speed_total / speeds),
+            max_speed_kts=_optional(maxima[0]),
+            max_gust_kts=_optional(maxima[1]),
+            gust_factor=_optional(ratio_total / gusts),
+            mean_direction_degrees=_optional(
+                np.rad2deg(np.arctan2(sin, cos)) % 360
+                if headings
+                else np.float64(np.nan)
+            ),
+            direction_variance=_optional(1 - np.hypot(sin, cos) / headings),
+        )
+
+
+def _add_hours(stats: WindStats, group: ObservationGroup) -> None:
+    hours = stats.hours_by_power_level.setdefault(group.sport, {})
+    hours[group.power_level] = hours.get(group.power_level, 0) + group.observations
+
+
+def summarize(
+    groups: Sequence[ObservationGroup],
+    average_speed_kts: Column,
+    gust_speed_kts: Column,
+    direction_degrees: npt.NDArray[np.intp],
+) -> WindSummary:
+    """
+    Summarize observations given as columns, with NaN for missing speeds and
+    -1 for missing directions.
+
+    The columns hold the observations of each of groups in turn, and groups
+    must be ordered by location.
+    """
+    if not groups:
+        return WindSummary(
+            overall=WindStats(0, None, None, None, None, None, None), locations={}
+        )
+
+    counts = np.array([group.observations for group in groups], dtype=np.intp)
+    # Locations cover consecutive groups, so their observations are contiguous
+    firsts = [
+        i
+        for i, group in enumerate(groups)
+        if i == 0 or group.location != groups[i - 1].location
+    ]
+    starts = (np.cumsum(counts) - counts)[firsts]
+
+    has_speed = ~np.isnan(average_speed_kts)
+    has_gust = has_speed & ~np.isnan(gust_speed_kts) & (average_speed_kts > 0)
+    # Every sum is taken per location in one pass, and the overall sums from those
+    sums = np.add.reduceat(
+        np.stack(
+            [
+                has_speed,
+                np.where(has_speed, average_speed_kts, 0),
+                has_gust,
+                np.divide(
+                    gust_speed_kts,
+                    average_speed_kts,
+                    out=np.zeros_like(average_speed_kts),
+                    where=has_gust,
+                ),
+                direction_degrees >= 0,
+                _SIN[direction_degrees],
+                _COS[direction_degrees],
+            ]
+        ),
+        starts,
+        axis=1,
+        dtype=np.float64,
+    )
+    maxima = np.stack(
+        [
+            np.fmax.reduceat(average_speed_kts, starts),
+            np.fmax.reduceat(gust_speed_kts, starts),
+        ]
+    )
+    observations = np.add.reduceat(counts, firsts)
+
+    overall = _to_stats(
+        int(counts.sum()), sums.sum(axis=1), np.fmax.reduce(maxima, axis=1)
+    )
+    locations = {
+        groups[first].location: _to_stats(
+            int(observations[i]), sums[:, i], maxima[:, i]
+        )
+        for i, first in enumerate(firsts)
+    }
+
+    for group in groups:
+        _add_hours(overall, group)
+        _add_hours(locations[group.location], group)
+
+    return WindSummary(overall=overall, locations=locations)
+
+
+def _packed[T](
+    send: str,
+    value: sql.ColumnElement[T],
+    missing: sql.ColumnElement[T],
+    order: Sequence[sql.ColumnExpressionArgument[Any]],
+) -> sql.ColumnElement[bytes]:
+    # The binary representations of a group's values, concatenated, which NumPy
+    # reads without creating a Python object per value. Every aggregate of a
+    # group is given the same order, so the columns stay aligned.
+    return sql.func.string_agg(
+        getattr(sql.func, send)(sql.func.coalesce(value, missing)),
+        postgresql.aggregate_order_by(  # type: ignore[no-untyped-call]
+            sql.literal(b"", sql.LargeBinary), *order
+        ),
+        type_=sql.LargeBinary,
+    )
+
+
+def _read[T: np.generic](
+    data: list[bytes], dtype: str, as_type: type[T]
+) -> npt.NDArray[T]:
+    # Sent in network byte order
+    return np.frombuffer(b"".join(data), dtype=dtype).astype(as_type)
+
+
+async def get_summary(
+    session: AsyncSession, current_user: User | Principal
+) -> WindSummary:
+    """
+    Summarize the wind during the current user's sessions, overall and by
+    location, from columns loaded in a single query.
+    """
+    observations = (
+        sql.func.unnest(
+            WindSession.average_speed_kts,
+            WindSession.gust_speed_kts,
+            WindSession.direction_degrees,
+        )
+        .table_valued(
+            "average_speed_kts",
+            "gust_speed_kts",
+            "direction_degrees",
+            with_ordinality="ordinality",
+        )
+        .render_derived()
+    )
+    # Sessions in turn, each with its observations in the order they were taken
+    order = (WindSession.id, observations.c.ordinality)
+    query = (
+        sql.select(
+            WindSession.location,
+            WindSession.sport,
+            WindSession.power_level,
+            sql.func.count().label("observations"),
+            _packed(
+                "float4send",
+                observations.c.average_speed_kts,
+                sql.literal_column("'NaN'::real", sql.REAL),
+                order,
+            ).label("average_speed_kts"),
+            _packed(
+                "float4send",
+                observations.c.gust_speed_kts,
+                sql.literal_column("'NaN'::real", sql.REAL),
+                order,
+            ).label("gust_speed_kts"),
+            _packed(
+                "int2send",
+                observations.c.direction_degrees,
+                sql.literal_column("-1::smallint", sql.SmallInteger),
+                order,
+            ).label("direction_degrees"),
+        )
+        .join(observations, sql.true())
+        .where(WindSession.user_id == current_user.id)
+        .group_by(WindSession.location, WindSession.sport, WindSession.power_level)
+        .order_by(WindSession.location, WindSession.sport, WindSession.power_level)
+    )
+    rows = (await session.execute(query)).all()
+
+    return summarize(
+        [
+            ObservationGroup(
+                location=row.location,
+                sport=row.sport,
+                power_level=row.power_level,
+                observations=row.observations,
+            )
+            for row in rows
+        ],
+        _read([row.average_speed_kts for row in rows], ">f4", np.float64),
+        _read([row.gust_speed_kts for row in rows], ">f4", np.float64),
+        _read([row.direction_degrees for row in rows], ">i2", np.intp),
+    )
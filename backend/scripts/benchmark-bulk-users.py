@@ -0,0 +1,86 @@
+"""
+Measure how many users per second users.create_many provisions, next to one
+users.create call per user as the API was previously driven.
+
+Both runs hash with the configured BCRYPT_ROUNDS and hashing pool, so expect
+the numbers to follow PASSWORD_HASHING_WORKERS and PASSWORD_HASHING_EXECUTOR:
+
+    PASSWORD_HASHING_EXECUTOR=process python scripts/benchmark-bulk-users.py
+
+Users are inserted in a transaction that is rolled back at the end.
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import config, db, security, users
+
+
+def new_users(count: int, run: str) -> list[dict[str, str]]:
+    return [
+        {
+            "email": f"user{i}.{run}@benchmark.test",
+            "name": f"User {i}",
+            "password": f"password {i}",
+        }
+        for i in range(count)
+    ]
+
+
+def report(name: str, count: int, elapsed: float) -> None:
+    print(
+        f"{name:<12} users={count:<7} {elapsed:8.2f} s  {count / elapsed:9.1f} users/s"
+    )
+
+
+async def benchmark(count: int, sequential: int) -> None:
+    settings = config.settings()
+    admin = users.Principal(
+        id=uuid.uuid4(),
+        email="admin@benchmark.test",
+        name="Admin",
+        admin=True,
+        version=1,
+    )
+    print(
+        f"bcrypt rounds={settings.BCRYPT_ROUNDS} "
+        f"executor={settings.PASSWORD_HASHING_EXECUTOR} "
+        f"workers={settings.PASSWORD_HASHING_WORKERS}"
+    )
+
+    async with db.engine().connect() as connection:
+        transaction = await connection.begin()
+        session = AsyncSession(bind=connection)
+
+        if sequential:
+            began = time.perf_counter()
+            for new_user in new_users(sequential, "sequential"):
+                await users.create(session, admin, **new_user)
+                await session.flush()
+            report("create", sequential, time.perf_counter() - began)
+
+        began = time.perf_counter()
+        results = await users.create_many(session, admin, new_users(count, "bulk"))
+        report("create_many", count, time.perf_counter() - began)
+        assert all(result.status == "created" for result in results)
+
+        await session.close()
+        await transaction.rollback()
+
+    security.shutdown_hashing_pool()
+    await db.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="benchmark-bulk-users", usage="%(prog)s [options]"
+    )
+    parser.add_argument("--count", "-c", type=int, default=2000)
+    parser.add_argument("--sequential", "-s", type=int, default=100)
+    args = parser.parse_args()
+
+    asyncio.run(benchmark(args.count, args.sequential))
@@ -0,0 +1,120 @@
+"""
+Compare db.keyset_paginate with sqlakeyset by walking pages of the users table
+from a position deep into it.
+
+sqlakeyset is no longer a dependency, so run this with:
+
+    uv run --with sqlakeyset python scripts/benchmark-pagination.py --rows 2000000
+
+Seeded rows are inserted in a transaction that is rolled back at the end.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import sqlalchemy as sql
+from sqlakeyset.asyncio import select_page
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import db
+from app.core.users import User
+
+SEED_USERS = sql.text(
+    """
+    INSERT INTO users (id, email, name, hashed_password, admin, version)
+    SELECT md5(random()::text || i)::uuid, 'user' || i || '@benchmark.test',
+        'User ' || i, 'not a hash', false, 1
+    FROM generate_series(1, :rows) AS i
+    """
+)
+
+
+async def walk(
+    fetch_page: Callable[[Any], Awaitable[tuple[int, Any]]], start: Any, pages: int
+) -> tuple[list[float], list[int]]:
+    timings = []
+    cursor_lengths = []
+    cursor = start
+    for _ in range(pages):
+        began = time.perf_counter()
+        cursor_length, cursor = await fetch_page(cursor)
+        timings.append(time.perf_counter() - began)
+        cursor_lengths.append(cursor_length)
+        if cursor is None:
+            break
+    return timings, cursor_lengths
+
+
+def report(name: str, timings: list[float], cursor_lengths: list[int]) -> None:
+    timings_ms = sorted(timing * 1000 for timing in timings)
+    p95 = timings_ms[int(len(timings_ms) * 0.95) - 1]
+    print(
+        f"{name:<16} pages={len(timings_ms):<5} "
+        f"mean={statistics.mean(timings_ms):7.2f} ms  p95={p95:7.2f} ms  "
+        f"cursor={statistics.mean(cursor_lengths):5.0f} chars"
+    )
+
+
+async def benchmark(rows: int, pages: int, page_size: int, depth: float) -> None:
+    async with db.engine().connect() as connection:
+        transaction = await connection.begin()
+        session = AsyncSession(bind=connection)
+
+        if rows:
+            await session.execute(SEED_USERS, {"rows": rows})
+            await session.execute(sql.text("ANALYZE users"))
+
+        total = await session.scalar(sql.select(sql.func.count()).select_from(User))
+        start_id = await session.scalar(
+            sql.select(User.id).order_by(User.id).offset(int(total * depth)).limit(1)
+        )
+
+        async def native_page(cursor: str) -> tuple[int, str | None]:
+            page = await db.keyset_paginate(
+                session, sql.select(User), (User.id,), page_size, cursor
+            )
+            return len(page.after or ""), page.after
+
+        async def sqlakeyset_page(cursor: Any) -> tuple[int, Any]:
+            page = await select_page(
+                session,
+                sql.select(User).order_by(User.id),
+                per_page=page_size,
+                page=cursor,
+            )
+            if not page.paging.has_next:
+                return 0, None
+            bookmark = page.paging.bookmark_next
+            return len(bookmark), bookmark
+
+        print(f"{total} users, starting at row {int(total * depth)}")
+        report(
+            "keyset_paginate",
+            *await walk(native_page, db._encode_cursor(db._AFTER, [start_id]), pages),
+        )
+        report(
+            "sqlakeyset",
+            *await walk(sqlakeyset_page, ((start_id,), False), pages),
+        )
+
+        await session.close()
+        await transaction.rollback()
+
+    await db.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="benchmark-pagination", usage="%(prog)s [options]"
+    )
+    parser.add_argument("--rows", "-r", type=int, default=0)
+    parser.add_argument("--pages", "-p", type=int, default=200)
+    parser.add_argument("--page-size", "-s", type=int, default=50)
+    parser.add_argument("--depth", "-d", type=float, default=0.5)
+    args = parser.parse_args()
+
+    asyncio.run(benchmark(args.rows, args.pages, args.page_size, args.depth))
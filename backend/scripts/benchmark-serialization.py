@@ -0,0 +1,74 @@
+"""
+Time encoding a page of users for GET /users/ the way the endpoint now does it,
+next to the previous path: UserPublic.model_validate for every row, followed by
+FastAPI validating the page against the response model again and encoding it
+with JSONResponse.
+
+No database is needed, the users are built in memory.
+"""
+
+import argparse
+import statistics
+import timeit
+import uuid
+
+from fastapi.responses import JSONResponse
+
+from app.api import users as users_api
+from app.api.users import UserPublic
+from app.core import db, users
+
+
+def build_users(count: int) -> list[users.User]:
+    return [
+        users.User(
+            email=f"user{i}@benchmark.test",
+            name=f"User {i}",
+            hashed_password="not a hash",
+            id=uuid.uuid4(),
+        )
+        for i in range(count)
+    ]
+
+
+def benchmark(rows: int, repeat: int, number: int) -> None:
+    page_users = build_users(rows)
+    adapter = users_api._users_page_adapter
+
+    def previous() -> bytes:
+        page = db.Page(
+            items=[UserPublic.model_validate(user) for user in page_users],
+            after="cursor",
+            before=None,
+        )
+        value = adapter.validate_python(page, from_attributes=True)
+        return JSONResponse(adapter.dump_python(value, mode="json")).body
+
+    def current() -> bytes:
+        page = db.Page(
+            items=[users_api._from_attributes(UserPublic, user) for user in page_users],
+            after="cursor",
+            before=None,
+        )
+        return users_api._json_response(adapter, page).body
+
+    for name, encode in (("previous", previous), ("current", current)):
+        timings = timeit.repeat(encode, repeat=repeat, number=number)
+        per_page_ms = [timing / number * 1000 for timing in timings]
+        print(
+            f"{name:<10} rows={rows:<6} "
+            f"median={statistics.median(per_page_ms):7.2f} ms  "
+            f"min={min(per_page_ms):7.2f} ms per page"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="benchmark-serialization", usage="%(prog)s [options]"
+    )
+    parser.add_argument("--rows", "-r", type=int, default=1000)
+    parser.add_argument("--repeat", "-n", type=int, default=7)
+    parser.add_argument("--number", "-k", type=int, default=20)
+    args = parser.parse_args()
+
+    benchmark(args.rows, args.repeat, args.number)
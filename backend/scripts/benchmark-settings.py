@@ -0,0 +1,22 @@
+import argparse
+import timeit
+
+from app.core import config
+
+
+def benchmark(number: int) -> None:
+    config.settings()
+    rebuilt = timeit.timeit(config.Settings, number=number) / number  # type: ignore
+    cached = timeit.timeit(config.settings, number=number) / number
+    print(f"Settings() per call:         {rebuilt * 1e6:10.2f} us")
+    print(f"config.settings() per call:  {cached * 1e6:10.2f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="benchmark-settings", usage="%(prog)s [options]"
+    )
+    parser.add_argument("--number", "-n", type=int, default=1000)
+    args = parser.parse_args()
+
+    benchmark(args.number)
@@ -0,0 +1,95 @@
+"""
+Compare sending emails with a new SMTP session each (aiosmtplib.send) against
+the pooled connections behind emails.send_email and emails.send_emails, using
+a local aiosmtpd server that accepts and discards every message.
+
+aiosmtpd is not a dependency, so run this with:
+
+    uv run --with aiosmtpd python scripts/benchmark-smtp.py --messages 500
+
+The local server offers neither TLS nor authentication, so against a real
+relay the per-session setup, and with it the gap, is larger still.
+"""
+
+import argparse
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+from email.message import EmailMessage
+
+import aiosmtplib
+from aiosmtpd.controller import Controller
+
+from app.core import emails
+
+HOSTNAME = "127.0.0.1"
+
+
+class DiscardingHandler:
+    async def handle_DATA(self, *_: object) -> str:
+        return "250 OK"
+
+
+def report(name: str, count: int, elapsed: float) -> None:
+    print(
+        f"{name:<22} messages={count:<6} {elapsed:7.2f} s  "
+        f"{count / elapsed:8.1f} messages/s"
+    )
+
+
+async def timed(name: str, count: int, run: Callable[[], Awaitable[object]]) -> None:
+    began = time.perf_counter()
+    await run()
+    report(name, count, time.perf_counter() - began)
+
+
+async def benchmark(count: int, concurrency: int, port: int) -> None:
+    email = emails.EmailData(html_content="<p>Benchmark</p>", subject="Benchmark")
+    recipients = [f"user{i}@benchmark.test" for i in range(count)]
+    messages = [emails._to_message(email, recipient) for recipient in recipients]
+    pool = emails.SMTPPool(hostname=HOSTNAME, port=port, size=concurrency)
+    emails._smtp_pool = pool
+    limit = asyncio.Semaphore(concurrency)
+
+    async def send_unpooled(message: EmailMessage) -> None:
+        async with limit:
+            await aiosmtplib.send(message, hostname=HOSTNAME, port=port)
+
+    async def unpooled() -> None:
+        await asyncio.gather(*(send_unpooled(message) for message in messages))
+
+    async def pooled() -> None:
+        await asyncio.gather(
+            *(emails.send_email(email, recipient) for recipient in recipients)
+        )
+
+    async def batched() -> None:
+        per_batch = -(-count // concurrency)
+        await asyncio.gather(
+            *(
+                emails.send_emails(
+                    [(email, recipient) for recipient in recipients[i : i + per_batch]]
+                )
+                for i in range(0, count, per_batch)
+            )
+        )
+
+    await timed("aiosmtplib.send", count, unpooled)
+    await timed("emails.send_email", count, pooled)
+    await timed("emails.send_emails", count, batched)
+    await emails.close_smtp_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="benchmark-smtp", usage="%(prog)s [options]")
+    parser.add_argument("--messages", "-m", type=int, default=500)
+    parser.add_argument("--concurrency", "-c", type=int, default=4)
+    parser.add_argument("--port", "-p", type=int, default=8025)
+    args = parser.parse_args()
+
+    controller = Controller(DiscardingHandler(), hostname=HOSTNAME, port=args.port)
+    controller.start()
+    try:
+        asyncio.run(benchmark(args.messages, args.concurrency, args.port))
+    finally:
+        controller.stop()
@@ -0,0 +1,73 @@
+"""
+Compare random (version 4) and time-ordered (version 7) UUID primary keys by
+inserting the same number of rows into two otherwise identical tables and
+reporting insert throughput and the size of each primary key index.
+
+The tables are created and dropped inside a transaction that is rolled back.
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from collections.abc import Callable
+
+import sqlalchemy as sql
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core import db
+
+TABLES = {"uuid_v4": uuid.uuid4, "uuid_v7": db.uuid7}
+
+
+async def insert(
+    connection: AsyncConnection,
+    table: str,
+    new_id: Callable[[], uuid.UUID],
+    rows: int,
+    batch_size: int,
+) -> float:
+    statement = sql.text(f"INSERT INTO {table} (id, payload) VALUES (:id, :payload)")
+    began = time.perf_counter()
+    for start in range(0, rows, batch_size):
+        await connection.execute(
+            statement,
+            [
+                {"id": new_id(), "payload": f"row {i}"}
+                for i in range(start, min(start + batch_size, rows))
+            ],
+        )
+    return time.perf_counter() - began
+
+
+async def benchmark(rows: int, batch_size: int) -> None:
+    async with db.engine().connect() as connection:
+        transaction = await connection.begin()
+
+        for table, new_id in TABLES.items():
+            await connection.execute(
+                sql.text(
+                    f"CREATE TEMPORARY TABLE {table} (id uuid PRIMARY KEY, payload text)"
+                )
+            )
+            elapsed = await insert(connection, table, new_id, rows, batch_size)
+            index_size = await connection.scalar(
+                sql.text(f"SELECT pg_relation_size('{table}_pkey')")
+            )
+            print(
+                f"{table:<8} rows={rows:<9} {rows / elapsed:10.0f} rows/s  "
+                f"pkey={index_size / 2**20:8.1f} MiB"
+            )
+
+        await transaction.rollback()
+
+    await db.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="benchmark-uuid", usage="%(prog)s [options]")
+    parser.add_argument("--rows", "-r", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", "-b", type=int, default=5000)
+    args = parser.parse_args()
+
+    asyncio.run(benchmark(args.rows, args.batch_size))
@@ -0,0 +1,186 @@
+"""
+Time the wind statistics behind the session summary over synthetic hourly
+observations, against the same statistics computed one observation at a time.
+
+With --database the observations are also stored as sessions of a temporary
+user, and loading and summarizing them is timed end to end. Everything is
+written inside a transaction that is rolled back.
+"""
+
+import argparse
+import asyncio
+import datetime
+import math
+import time
+from collections.abc import Callable
+from itertools import pairwise
+
+import numpy as np
+import sqlalchemy as sql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import db, sessions, users, wind_statistics
+
+HOURS_PER_SESSION = 4
+SPORTS = ("windsurfing", "wingfoiling")
+POWER_LEVELS = ("underpowered", "wellpowered", "overpowered")
+
+
+def observations(
+    count: int, locations: int
+) -> tuple[list[wind_statistics.ObservationGroup], np.ndarray, np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(0)
+    keys = [
+        (f"Location {location:03d}", sport, power_level)
+        for location in range(locations)
+        for sport in SPORTS
+        for power_level in POWER_LEVELS
+    ]
+    bounds = np.linspace(0, count, len(keys) + 1, dtype=int)
+    groups = [
+        wind_statistics.ObservationGroup(*key, observations=int(end - start))
+        for key, (start, end) in zip(keys, pairwise(bounds), strict=True)
+    ]
+
+    average = rng.gamma(6, 2.5, count)
+    gust = average * rng.uniform(1, 1.6, count)
+    direction = rng.vonmises(np.pi, 2, count) % (2 * np.pi)
+    direction = np.rad2deg(direction).astype(np.intp) % 360
+    # Some readings are left out, as they are in real logbooks
+    average[rng.random(count) < 0.05] = np.nan
+    gust[rng.random(count) < 0.1] = np.nan
+    direction[rng.random(count) < 0.05] = -1
+
+    return groups, average, gust, direction
+
+
+def summarize_per_observation(
+    average: list[float], gust: list[float], direction: list[int]
+) -> tuple[float, float, float, float]:
+    speeds = ratios = headings = 0
+    total_speed = total_ratio = sin = cos = 0.0
+    for a, g, d in zip(average, gust, direction, strict=True):
+        if not math.isnan(a):
+            speeds += 1
+            total_speed += a
+            if not math.isnan(g) and a > 0:
+                ratios += 1
+                total_ratio += g / a
+        if d >= 0:
+            headings += 1
+            sin += math.sin(math.radians(d))
+            cos += math.cos(math.radians(d))
+    return (
+        total_speed / speeds,
+        total_ratio / ratios,
+        math.degrees(math.atan2(sin, cos)) % 360,
+        1 - math.hypot(sin, cos) / headings,
+    )
+
+
+def timed(label: str, count: int, fn: Callable[[], object]) -> None:
+    began = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - began
+    print(f"{label:<16} {elapsed * 1000:9.1f} ms  {count / elapsed:12.0f} obs/s")
+
+
+async def benchmark_database(
+    groups: list[wind_statistics.ObservationGroup],
+    average: np.ndarray,
+    gust: np.ndarray,
+    direction: np.ndarray,
+) -> None:
+    def reading(value: float) -> float | None:
+        return None if math.isnan(value) else value
+
+    principal = users.Principal(
+        id=db.uuid7(),
+        email="benchmark@wind.test",
+        name="Benchmark",
+        admin=False,
+        version=1,
+    )
+    new_sessions = []
+    start = 0
+    for group in groups:
+        for offset in range(start, start + group.observations, HOURS_PER_SESSION):
+            end = min(offset + HOURS_PER_SESSION, start + group.observations)
+            new_sessions.append(
+                {
+                    "date": datetime.date(2020, 1, 1),
+                    "start_time": datetime.time(12),
+                    "end_time": datetime.time(12 + end - offset - 1),
+                    "location": group.location,
+                    "sport": group.sport,
+                    "equipment": "",
+                    "power_level": group.power_level,
+                    "observations": [
+                        {
+                            "average_speed_kts": reading(average[i]),
+                            "gust_speed_kts": reading(gust[i]),
+                            "direction_degrees": None
+                            if direction[i] < 0
+                            else int(direction[i]),
+                        }
+                        for i in range(offset, end)
+                    ],
+                }
+            )
+        start += group.observations
+
+    async with db.engine().connect() as connection:
+        transaction = await connection.begin()
+        session = AsyncSession(bind=connection)
+
+        await session.execute(
+            sql.insert(users.User).values(
+                id=principal.id,
+                email=principal.email,
+                name=principal.name,
+                hashed_password="",
+                admin=False,
+                version=1,
+            )
+        )
+        began = time.perf_counter()
+        await sessions.create_many(session, principal, new_sessions)
+        elapsed = time.perf_counter() - began
+        print(f"{'ingest':<16} {elapsed * 1000:9.1f} ms  {len(new_sessions)} sessions")
+
+        began = time.perf_counter()
+        await wind_statistics.get_summary(session, principal)
+        elapsed = time.perf_counter() - began
+        print(f"{'load + summary':<16} {elapsed * 1000:9.1f} ms")
+
+        await session.close()
+        await transaction.rollback()
+
+    await db.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="benchmark-wind-statistics", usage="%(prog)s [options]"
+    )
+    parser.add_argument("--observations", "-n", type=int, default=1_000_000)
+    parser.add_argument("--locations", "-l", type=int, default=20)
+    parser.add_argument("--database", "-d", action="store_true")
+    args = parser.parse_args()
+
+    groups, average, gust, direction = observations(args.observations, args.locations)
+
+    timed(
+        "vectorized",
+        args.observations,
+        lambda: wind_statistics.summarize(groups, average, gust, direction),
+    )
+    columns = (average.tolist(), gust.tolist(), direction.tolist())
+    timed(
+        "per observation",
+        args.observations,
+        lambda: summarize_per_observation(*columns),
+    )
+
+    if args.database:
+        asyncio.run(benchmark_database(groups, average, gust, direction))
@@ -0,0 +1,50 @@
+import argparse
+import statistics
+import time
+
+from passlib.hash import bcrypt
+
+MIN_ROUNDS = 4
+MAX_ROUNDS = 31
+
+
+def time_verify(rounds: int, samples: int) -> float:
+    hashed = bcrypt.using(rounds=rounds).hash("calibration password")
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        bcrypt.verify("calibration password", hashed)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def calibrate(target_ms: float, samples: int) -> int:
+    # Each extra round doubles the cost, so measure a cheap cost factor and
+    # extrapolate, then confirm the pick on this host
+    baseline_rounds = 8
+    baseline = time_verify(baseline_rounds, samples)
+    rounds = baseline_rounds
+    while (
+        rounds < MAX_ROUNDS
+        and baseline * 2 ** (rounds + 1 - baseline_rounds) * 1000 <= target_ms
+    ):
+        rounds += 1
+
+    while rounds > MIN_ROUNDS and time_verify(rounds, samples) * 1000 > target_ms:
+        rounds -= 1
+
+    return rounds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="calibrate-bcrypt", usage="%(prog)s [options]"
+    )
+    parser.add_argument("--target-ms", "-t", type=float, default=250)
+    parser.add_argument("--samples", "-s", type=int, default=5)
+    args = parser.parse_args()
+
+    rounds = calibrate(args.target_ms, args.samples)
+    measured = time_verify(rounds, args.samples) * 1000
+    print(f"# {measured:.0f} ms per verify on this host")
+    print(f"BCRYPT_ROUNDS={rounds}")
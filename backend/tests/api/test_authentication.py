@@ -0,0 +1,93 @@
+import datetime
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import config, security, users
+
+settings = config.settings()
+
+
+async def test_refresh_token(client: AsyncClient, user: users.User) -> None:
+    refresh_token = security.create_refresh_token(
+        user.id, datetime.timedelta(minutes=5), user.version
+    )
+
+    response = await client.post(
+        f"{settings.API_V1_STR}{settings.REFRESH_TOKEN_ENDPOINT}",
+        json={"refresh_token": refresh_token},
+    )
+
+    assert response.status_code == 200
+    access_token = response.json()["access_token"]
+    assert security.decode_access_token(access_token) == str(user.id)
+
+
+async def test_refresh_token_rejects_access_token(
+    client: AsyncClient, user_token: str
+) -> None:
+    response = await client.post(
+        f"{settings.API_V1_STR}{settings.REFRESH_TOKEN_ENDPOINT}",
+        json={"refresh_token": user_token},
+    )
+
+    assert response.status_code == 401
+
+
+async def test_logout_revokes_token(client: AsyncClient, user_token: str) -> None:
+    headers = {"Authorization": f"Bearer {user_token}"}
+
+    response = await client.post(f"{settings.API_V1_STR}/logout", headers=headers)
+    assert response.status_code == 200
+
+    response = await client.get(f"{settings.API_V1_STR}/users/me", headers=headers)
+    assert response.status_code == 401
+
+
+async def test_refresh_token_rejects_stale_version(
+    client: AsyncClient, session: AsyncSession, user: users.User
+) -> None:
+    refresh_token = security.create_refresh_token(
+        user.id, datetime.timedelta(minutes=5), user.version
+    )
+    user.version += 1
+    await session.flush()
+
+    response = await client.post(
+        f"{settings.API_V1_STR}{settings.REFRESH_TOKEN_ENDPOINT}",
+        json={"refresh_token": refresh_token},
+    )
+
+    assert response.status_code == 401
+
+
+async def test_logout_revokes_refresh_token(
+    client: AsyncClient, user: users.User, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(
+        config,
+        "_settings",
+        config.settings().model_copy(update={"SELF_CONTAINED_TOKENS": True}),
+    )
+    response = await client.post(
+        f"{settings.API_V1_STR}{settings.REFRESH_TOKEN_ENDPOINT}",
+        json={
+            "refresh_token": security.create_refresh_token(
+                user.id, datetime.timedelta(minutes=5), user.version
+            )
+        },
+    )
+    tokens = response.json()
+
+    response = await client.post(
+        f"{settings.API_V1_STR}/logout",
+        headers={"Authorization": f"Bearer {tokens['access_token']}"},
+    )
+    assert response.status_code == 200
+
+    response = await client.post(
+        f"{settings.API_V1_STR}{settings.REFRESH_TOKEN_ENDPOINT}",
+        json={"refresh_token": tokens["refresh_token"]},
+    )
+    assert response.status_code == 401
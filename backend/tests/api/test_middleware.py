@@ -0,0 +1,45 @@
+import logging
+
+import pytest
+from httpx import AsyncClient
+
+from app.core import config, users
+
+settings = config.settings()
+
+
+@pytest.mark.usefixtures("user")
+async def test_server_timing_counts_queries(
+    client: AsyncClient, user_token: str
+) -> None:
+    response = await client.get(
+        f"{settings.API_V1_STR}/users/me",
+        headers={"Authorization": f"Bearer {user_token}"},
+    )
+
+    assert response.status_code == 200
+    db_timing = response.headers["Server-Timing"].split(", ")[0]
+    assert db_timing.startswith("db;dur=")
+    assert not db_timing.endswith('desc="0 queries"')
+
+
+async def test_query_count_warning(
+    client: AsyncClient,
+    user: users.User,
+    user_token: str,
+    monkeypatch: pytest.MonkeyPatch,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    monkeypatch.setattr(
+        config,
+        "_settings",
+        config.settings().model_copy(update={"QUERY_COUNT_WARNING_THRESHOLD": 0}),
+    )
+
+    with caplog.at_level(logging.WARNING, logger="app.api.middleware"):
+        await client.get(
+            f"{settings.API_V1_STR}/users/{user.id}",
+            headers={"Authorization": f"Bearer {user_token}"},
+        )
+
+    assert "route=users-get_user method=GET" in caplog.text
@@ -0,0 +1,148 @@
+import datetime
+import uuid
+
+import pytest
+import sqlalchemy as sql
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import config, security, sessions, users
+
+settings = config.settings()
+
+
+def _new_session(day: int, **overrides: object) -> dict[str, object]:
+    return {
+        "date": f"2026-06-{day:02d}",
+        "start_time": "13:00",
+        "end_time": "15:30",
+        "location": "Brouwersdam",
+        "sport": "windsurfing",
+        "equipment": "5.3 sail, 95l board",
+        "power_level": "wellpowered",
+        "observations": [
+            {"average_speed_kts": 18.5, "gust_speed_kts": 24, "direction_degrees": 225},
+            {"average_speed_kts": 20, "gust_speed_kts": 27.5, "direction_degrees": 240},
+            {"average_speed_kts": None, "gust_speed_kts": None},
+        ],
+    } | overrides
+
+
+async def test_create_sessions(
+    client: AsyncClient, session: AsyncSession, user: users.User, user_token: str
+) -> None:
+    await session.flush()
+
+    response = await client.post(
+        f"{settings.API_V1_STR}/sessions/bulk",
+        headers={"Authorization": f"Bearer {user_token}"},
+        json=[_new_session(1), _new_session(2, sport="wingfoiling", observations=[])],
+    )
+
+    assert response.status_code == 200
+    ids = [uuid.UUID(session_id) for session_id in response.json()]
+    assert len(ids) == 2
+
+    created = await session.get(sessions.WindSession, ids[0])
+    assert created is not None
+    assert created.user_id == user.id
+    assert created.average_speed_kts == [18.5, 20, None]
+    assert created.gust_speed_kts == [24, 27.5, None]
+    assert created.direction_degrees == [225, 240, None]
+
+
+async def test_create_sessions_for_deleted_user(
+    client: AsyncClient,
+    session: AsyncSession,
+    user: users.User,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(
+        config,
+        "_settings",
+        config.settings().model_copy(update={"SELF_CONTAINED_TOKENS": True}),
+    )
+    await session.flush()
+    token = security.create_access_token(
+        user.id,
+        datetime.timedelta(minutes=5),
+        claims={"email": user.email, "name": user.name, "admin": False, "ver": 1},
+    )
+    await session.execute(sql.delete(users.User).where(users.User.id == user.id))
+
+    response = await client.post(
+        f"{settings.API_V1_STR}/sessions/bulk",
+        headers={"Authorization": f"Bearer {token}"},
+        json=[_new_session(1)],
+    )
+
+    assert response.status_code == 404
+
+
+async def test_create_sessions_rejects_observations_outside_session(
+    client: AsyncClient, user_token: str
+) -> None:
+    response = await client.post(
+        f"{settings.API_V1_STR}/sessions/bulk",
+        headers={"Authorization": f"Bearer {user_token}"},
+        json=[_new_session(1, end_time="14:00")],
+    )
+
+    assert response.status_code == 422
+
+
+async def test_get_sessions_pages_most_recent_first(
+    client: AsyncClient,
+    session: AsyncSession,
+    admin_user: users.User,
+    user: users.User,
+    user_token: str,
+) -> None:
+    await session.flush()
+    await sessions.create_many(session, user, [_new_session(day) for day in (3, 1, 2)])
+    # Sessions of other users are never listed
+    await sessions.create_many(session, admin_user, [_new_session(4)])
+    headers = {"Authorization": f"Bearer {user_token}"}
+
+    response = await client.get(
+        f"{settings.API_V1_STR}/sessions/", headers=headers, params={"count": 2}
+    )
+    first_page = response.json()
+    response = await client.get(
+        f"{settings.API_V1_STR}/sessions/",
+        headers=headers,
+        params={"count": 2, "cursor": first_page["after"]},
+    )
+    second_page = response.json()
+
+    assert [item["date"] for item in first_page["items"]] == [
+        "2026-06-03",
+        "2026-06-02",
+    ]
+    assert [item["date"] for item in second_page["items"]] == ["2026-06-01"]
+    assert second_page["after"] is None
+    assert first_page["items"][0]["observations"][1] == {
+        "average_speed_kts": 20,
+        "gust_speed_kts": 27.5,
+        "direction_degrees": 240,
+    }
+
+
+async def test_get_summary(
+    client: AsyncClient, session: AsyncSession, user: users.User, user_token: str
+) -> None:
+    await session.flush()
+    await sessions.create_many(session, user, [_new_session(1), _new_session(2)])
+
+    response = await client.get(
+        f"{settings.API_V1_STR}/sessions/summary",
+        headers={"Authorization": f"Bearer {user_token}"},
+    )
+
+    assert response.status_code == 200
+    summary = response.json()
+    assert summary["overall"]["observations"] == 6
+    assert summary["overall"]["max_gust_kts"] == 27.5
+    assert summary["locations"]["Brouwersdam"]["hours_by_power_level"] == {
+        "windsurfing": {"wellpowered": 6}
+    }
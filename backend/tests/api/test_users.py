@@ -1,7 +1,15 @@
+import csv
+import datetime
+import io
+import json
+import uuid
+
+import pytest
+import sqlalchemy as sql
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core import config, users
+from app.core import config, security, users
 
 settings = config.settings()
 
@@ -34,6 +42,207 @@ async def test_get_me(client: AsyncClient, user: users.User, user_token: str) ->
     }
 
 
+async def test_get_me_self_contained_token(
+    client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(
+        config,
+        "_settings",
+        config.settings().model_copy(update={"SELF_CONTAINED_TOKENS": True}),
+    )
+    # The user is never added to the database, so it must come from the claims
+    user_id = "5d0bb1bb-6a4c-4e55-8d5f-bbd0e3f7c6a1"
+    token = security.create_access_token(
+        user_id,
+        datetime.timedelta(minutes=5),
+        claims={"email": "claims@test.com", "name": "Claims", "admin": False, "ver": 1},
+    )
+
+    response = await client.get(
+        f"{settings.API_V1_STR}/users/me",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "email": "claims@test.com",
+        "id": user_id,
+        "name": "Claims",
+    }
+
+
+async def test_delete_user_revokes_self_contained_token(
+    client: AsyncClient,
+    session: AsyncSession,
+    user: users.User,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(
+        config,
+        "_settings",
+        config.settings().model_copy(update={"SELF_CONTAINED_TOKENS": True}),
+    )
+    await session.flush()
+    headers = {
+        "Authorization": "Bearer "
+        + security.create_access_token(
+            user.id,
+            datetime.timedelta(minutes=5),
+            claims={"email": user.email, "name": user.name, "admin": False, "ver": 1},
+        )
+    }
+
+    response = await client.delete(
+        f"{settings.API_V1_STR}/users/{user.id}", headers=headers
+    )
+    assert response.status_code == 200
+
+    response = await client.get(f"{settings.API_V1_STR}/users/me", headers=headers)
+    assert response.status_code == 401
+
+
+async def test_get_me_not_modified(
+    client: AsyncClient, user: users.User, user_token: str
+) -> None:
+    headers = {"Authorization": f"Bearer {user_token}"}
+
+    response = await client.get(f"{settings.API_V1_STR}/users/me", headers=headers)
+    etag = response.headers["ETag"]
+    assert etag == f'W/"{user.version}"'
+
+    response = await client.get(
+        f"{settings.API_V1_STR}/users/me", headers={**headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+async def test_get_user_modified_after_version_bump(
+    client: AsyncClient, session: AsyncSession, user: users.User, user_token: str
+) -> None:
+    url = f"{settings.API_V1_STR}/users/{user.id}"
+    headers = {"Authorization": f"Bearer {user_token}"}
+    etag = (await client.get(url, headers=headers)).headers["ETag"]
+
+    response = await client.get(url, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+
+    # The user may have been detached by the principal cache, so bump it in SQL
+    await session.execute(
+        sql.update(users.User)
+        .where(users.User.id == user.id)
+        .values(version=users.User.version + 1)
+    )
+
+    response = await client.get(url, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+@pytest.mark.usefixtures("user")
+async def test_get_users_page(client: AsyncClient, admin_user: users.User) -> None:
+    token = security.create_access_token(admin_user.id, datetime.timedelta(minutes=5))
+
+    response = await client.get(
+        f"{settings.API_V1_STR}/users/",
+        params={"count": 1},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    page = response.json()
+    assert page.keys() == {"items", "after", "before"}
+    assert len(page["items"]) == 1
+    assert page["items"][0].keys() == {"email", "id", "name"}
+    assert page["after"] is not None
+
+
+async def test_get_users_by_id(
+    client: AsyncClient, admin_user: users.User, user: users.User
+) -> None:
+    unknown = uuid.uuid4()
+    token = security.create_access_token(admin_user.id, datetime.timedelta(minutes=5))
+
+    response = await client.get(
+        f"{settings.API_V1_STR}/users/batch",
+        params={"ids": [str(unknown), str(user.id)]},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 200
+    assert response.json() == [
+        {"id": str(unknown), "status": "missing", "user": None},
+        {
+            "id": str(user.id),
+            "status": "found",
+            "user": {"email": user.email, "id": str(user.id), "name": user.name},
+        },
+    ]
+
+
+async def test_get_users_by_id_forbids_others(
+    client: AsyncClient, admin_user: users.User, user: users.User, user_token: str
+) -> None:
+    response = await client.get(
+        f"{settings.API_V1_STR}/users/batch",
+        params={"ids": [str(admin_user.id), str(user.id)]},
+        headers={"Authorization": f"Bearer {user_token}"},
+    )
+
+    assert response.status_code == 200
+    assert [result["status"] for result in response.json()] == ["forbidden", "found"]
+
+
+async def test_export_users_ndjson(
+    client: AsyncClient, admin_user: users.User, user: users.User
+) -> None:
+    token = security.create_access_token(admin_user.id, datetime.timedelta(minutes=5))
+
+    response = await client.get(
+        f"{settings.API_V1_STR}/users/export",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert {row["email"] for row in rows} >= {admin_user.email, user.email}
+    assert all(row.keys() == {"id", "email", "name", "admin"} for row in rows)
+
+
+async def test_export_users_csv(
+    client: AsyncClient, admin_user: users.User, user: users.User
+) -> None:
+    token = security.create_access_token(admin_user.id, datetime.timedelta(minutes=5))
+
+    response = await client.get(
+        f"{settings.API_V1_STR}/users/export",
+        params={"format": "csv"},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert {
+        "id": str(user.id),
+        "email": user.email,
+        "name": user.name,
+        "admin": "False",
+    } in rows
+
+
+async def test_export_users_requires_admin(
+    client: AsyncClient, user_token: str
+) -> None:
+    response = await client.get(
+        f"{settings.API_V1_STR}/users/export",
+        headers={"Authorization": f"Bearer {user_token}"},
+    )
+
+    assert response.status_code == 403
+
+
 # def test_get_existing_user(
 #     client: TestClient, superuser_token_headers: dict[str, str], db: Session
 # ) -> None:
@@ -463,3 +672,23 @@ async def test_get_me(client: AsyncClient, user: users.User, user_token: str) ->
 #     assert r.status_code == 403
 #     assert r.json()["detail"] == "The user doesn't have enough privileges"
 #
+
+
+async def test_create_users(
+    client: AsyncClient, admin_user: users.User, user: users.User
+) -> None:
+    token = security.create_access_token(admin_user.id, datetime.timedelta(minutes=5))
+
+    response = await client.post(
+        f"{settings.API_V1_STR}/users/bulk",
+        json=[
+            {"email": "new@bulk.com", "name": "New", "password": "password1"},
+            {"email": user.email, "name": "Taken", "password": "password2"},
+        ],
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 200
+    results = response.json()
+    assert [result["status"] for result in results] == ["created", "duplicate"]
+    assert results[0]["id"] is not None
@@ -1,6 +1,7 @@
 import datetime
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
+from typing import Any
 
 import pytest
 import pytest_asyncio
@@ -14,12 +15,17 @@ from app.core.users import User
 
 @pytest_asyncio.fixture(autouse=True)
 async def session() -> AsyncGenerator[AsyncSession, None]:
-    connection = await db.engine.connect()
+    connection = await db.engine().connect()
     transaction = await connection.begin()
-    session = AsyncSession(bind=connection, join_transaction_mode="create_savepoint")
+    session = AsyncSession(
+        bind=connection,
+        join_transaction_mode="create_savepoint",
+        # As in production, so objects stay loaded after requests commit
+        expire_on_commit=False,
+    )
 
     @asynccontextmanager
-    async def mock_get_session():
+    async def mock_get_session(**_: Any):
         yield session
 
     gs = db.get_session
@@ -0,0 +1,147 @@
+import time
+
+import pytest
+import sqlalchemy as sql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import config, db
+from app.core.users import User
+
+settings = config.settings()
+
+
+async def test_keyset_paginate(session: AsyncSession) -> None:
+    emails = [f"user{i}@page.test" for i in range(5)]
+    session.add_all(
+        User(name="Test", email=email, hashed_password="fakehashedpassword")
+        for email in emails
+    )
+    selectable = sql.select(User).where(User.email.like("%@page.test"))
+
+    first = await db.keyset_paginate(session, selectable, (User.email,), 2)
+    second = await db.keyset_paginate(
+        session, selectable, (User.email,), 2, first.after
+    )
+    last = await db.keyset_paginate(session, selectable, (User.email,), 2, second.after)
+    previous = await db.keyset_paginate(
+        session, selectable, (User.email,), 2, last.before
+    )
+
+    assert [user.email for user in first.items] == emails[:2]
+    assert first.before is None
+    assert [user.email for user in second.items] == emails[2:4]
+    assert [user.email for user in last.items] == emails[4:]
+    assert last.after is None
+    assert [user.email for user in previous.items] == emails[2:4]
+
+
+async def test_keyset_paginate_rejects_tampered_cursor(session: AsyncSession) -> None:
+    cursor = db._encode_cursor("a", ["someone@page.test"])
+    tampered = cursor[:-1] + ("B" if cursor.endswith("A") else "A")
+
+    with pytest.raises(ValueError):
+        await db.keyset_paginate(session, sql.select(User), (User.email,), 2, tampered)
+
+
+def test_uuid7_is_time_ordered() -> None:
+    ids = [db.uuid7() for _ in range(10_000)]
+
+    assert all(each.version == 7 for each in ids)
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+    assert abs(int(ids[0].hex[:12], 16) - time.time() * 1000) < 1000
+
+
+async def test_uuid_generate_v7(session: AsyncSession) -> None:
+    generated = await session.scalar(sql.select(sql.func.uuid_generate_v7()))
+
+    assert generated.version == 7
+
+
+@pytest.fixture
+def replica(monkeypatch: pytest.MonkeyPatch) -> db._Replica:
+    replica = db._Replica(db._create_engine(str(settings.SQLALCHEMY_DATABASE_URI)))
+    monkeypatch.setattr(db, "_replicas", [replica])
+    return replica
+
+
+def test_routes_selects_to_replica(replica: db._Replica) -> None:
+    session = db._RoutingSession()
+
+    assert session.get_bind(clause=sql.select(User)) is replica.engine.sync_engine
+
+
+@pytest.mark.usefixtures("replica")
+def test_pins_session_to_primary_after_write() -> None:
+    session = db._RoutingSession()
+
+    session.get_bind(clause=sql.update(User).values(name="Test"))
+
+    assert session.get_bind(clause=sql.select(User)) is db.engine().sync_engine
+
+
+def test_keeps_session_on_one_replica(monkeypatch: pytest.MonkeyPatch) -> None:
+    url = str(settings.SQLALCHEMY_DATABASE_URI)
+    replicas = [db._Replica(db._create_engine(url)) for _ in range(2)]
+    monkeypatch.setattr(db, "_replicas", replicas)
+    session = db._RoutingSession()
+
+    first = session.get_bind(clause=sql.select(User))
+
+    assert session.get_bind(clause=sql.select(User)) is first
+    assert db._RoutingSession().get_bind(clause=sql.select(User)) is not first
+
+
+def test_pins_session_to_primary_when_replica_is_ejected(
+    replica: db._Replica,
+) -> None:
+    session = db._RoutingSession()
+    session.get_bind(clause=sql.select(User))
+    replica.ejected_until = time.monotonic() + 60
+
+    assert session.get_bind(clause=sql.select(User)) is db.engine().sync_engine
+    replica.ejected_until = 0
+    assert session.get_bind(clause=sql.select(User)) is db.engine().sync_engine
+
+
+def test_skips_ejected_replica(replica: db._Replica) -> None:
+    session = db._RoutingSession()
+    replica.ejected_until = time.monotonic() + 60
+
+    assert session.get_bind(clause=sql.select(User)) is db.engine().sync_engine
+
+
+@pytest.mark.skipif(
+    not settings.POSTGRES_REPLICA_URIS, reason="No replicas are configured"
+)
+async def test_reads_from_configured_replicas() -> None:
+    replica_ports = {url.hosts()[0]["port"] for url in settings.POSTGRES_REPLICA_URIS}
+
+    async with AsyncSession(sync_session_class=db._RoutingSession) as session:
+        for _ in range(len(replica_ports)):
+            port = await session.scalar(sql.select(sql.func.inet_server_port()))
+            assert port in replica_ports
+
+
+async def test_pool_stats_counts_checkouts() -> None:
+    count = db.pool_stats().checkout_wait.count
+
+    async with db.engine().connect():
+        assert db.pool_stats().checked_out >= 1
+
+    assert db.pool_stats().checkout_wait.count == count + 1
+
+
+async def test_pool_wait_excludes_connect_time() -> None:
+    engine = db._create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+    sql.event.listen(engine.sync_engine, "do_connect", lambda *_: time.sleep(0.2))
+    checkout_wait = db.pool_stats().checkout_wait
+    waited = checkout_wait.sum
+
+    try:
+        async with engine.connect():
+            pass
+    finally:
+        await engine.dispose()
+
+    assert checkout_wait.sum - waited < 0.1
@@ -0,0 +1,26 @@
+from pathlib import Path
+
+import pytest
+from jinja2 import FileSystemLoader
+
+from app.core import config, emails
+
+
+def test_render_reset_password_email_binds_project_name() -> None:
+    email_data = emails.render_reset_password_email("someone@test.com", "token")
+
+    assert config.settings().PROJECT_NAME in email_data.html_content
+    assert "?token=token" in email_data.html_content
+
+
+def test_load_templates() -> None:
+    emails.load_templates()
+
+
+def test_load_templates_fails_without_templates(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    monkeypatch.setattr(emails._environment, "loader", FileSystemLoader(tmp_path))
+
+    with pytest.raises(FileNotFoundError):
+        emails.load_templates()
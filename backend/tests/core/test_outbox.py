@@ -0,0 +1,186 @@
+import asyncio
+
+import aiosmtplib
+import pytest
+import sqlalchemy as sql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import config, emails, outbox, users
+
+
+@pytest.fixture(autouse=True)
+def emails_enabled(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(
+        config,
+        "_settings",
+        config.settings().model_copy(
+            update={"SMTP_HOST": "smtp.test.com", "EMAILS_FROM_EMAIL": "from@test.com"}
+        ),
+    )
+
+
+@pytest.fixture
+def sent(monkeypatch: pytest.MonkeyPatch) -> list[tuple[str, str]]:
+    sent: list[tuple[str, str]] = []
+
+    async def send_email(email: emails.EmailData, email_to: str) -> None:
+        sent.append((email_to, email.subject))
+
+    monkeypatch.setattr(emails, "send_email", send_email)
+    return sent
+
+
+async def test_request_password_reset_only_enqueues(
+    session: AsyncSession, user: users.User, sent: list[tuple[str, str]]
+) -> None:
+    await users.request_password_reset(session, user.email)
+    await session.flush()
+
+    queued = (await session.scalars(sql.select(outbox.OutboxEmail))).all()
+    assert [email.email_to for email in queued] == [user.email]
+    assert sent == []
+
+
+async def test_enqueue_skipped_when_emails_disabled(
+    session: AsyncSession, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(
+        config,
+        "_settings",
+        config.settings().model_copy(update={"SMTP_HOST": None}),
+    )
+
+    outbox.enqueue(
+        session, emails.EmailData(html_content="<p>Hi</p>", subject="Hi"), "a@test.com"
+    )
+    await session.flush()
+
+    assert await session.scalar(sql.select(sql.func.count(outbox.OutboxEmail.id))) == 0
+
+
+async def test_deliver_batch_leases_claimed_emails(
+    session: AsyncSession, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    outbox.enqueue(
+        session, emails.EmailData(html_content="<p>Hi</p>", subject="Hi"), "a@test.com"
+    )
+    claimed: list[int] = []
+
+    async def send_email(*_: object) -> None:
+        # Leased before sending, so no other worker can pick it up meanwhile
+        claimed.append(
+            await session.scalar(
+                sql.select(sql.func.count(outbox.OutboxEmail.id)).where(
+                    outbox.OutboxEmail.available_at <= sql.func.now()
+                )
+            )
+        )
+
+    monkeypatch.setattr(emails, "send_email", send_email)
+
+    assert await outbox.deliver_batch() == 1
+    assert claimed == [0]
+
+
+async def test_deliver_batch_sends_and_removes(
+    session: AsyncSession, sent: list[tuple[str, str]]
+) -> None:
+    outbox.enqueue(
+        session, emails.EmailData(html_content="<p>Hi</p>", subject="Hi"), "a@test.com"
+    )
+
+    assert await outbox.deliver_batch() == 1
+    assert sent == [("a@test.com", "Hi")]
+    assert await session.scalar(sql.select(sql.func.count(outbox.OutboxEmail.id))) == 0
+
+
+async def test_deliver_batch_dead_letters_after_max_attempts(
+    session: AsyncSession, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(
+        config,
+        "_settings",
+        config.settings().model_copy(
+            update={"OUTBOX_SEND_ATTEMPTS": 1, "OUTBOX_MAX_ATTEMPTS": 2}
+        ),
+    )
+
+    async def send_email(*_: object) -> None:
+        raise ConnectionRefusedError()
+
+    monkeypatch.setattr(emails, "send_email", send_email)
+    outbox.enqueue(
+        session, emails.EmailData(html_content="<p>Hi</p>", subject="Hi"), "a@test.com"
+    )
+
+    await outbox.deliver_batch()
+    email = await session.scalar(sql.select(outbox.OutboxEmail))
+    assert email is not None
+    assert email.attempts == 1
+    assert email.dead_at is None
+
+    # Due again straight away, rather than after the backoff
+    email.available_at = sql.func.now()
+    await outbox.deliver_batch()
+    await session.refresh(email)
+    assert email.attempts == 2
+    assert email.dead_at is not None
+
+
+async def test_deliver_batch_dead_letters_refused_recipient(
+    session: AsyncSession, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    attempts: list[str] = []
+
+    async def send_email(_: emails.EmailData, email_to: str) -> None:
+        attempts.append(email_to)
+        raise aiosmtplib.SMTPRecipientsRefused(
+            [aiosmtplib.SMTPRecipientRefused(550, "No such user", email_to)]
+        )
+
+    monkeypatch.setattr(emails, "send_email", send_email)
+    outbox.enqueue(
+        session, emails.EmailData(html_content="<p>Hi</p>", subject="Hi"), "a@test.com"
+    )
+
+    await outbox.deliver_batch()
+    email = await session.scalar(sql.select(outbox.OutboxEmail))
+    assert email is not None
+    assert attempts == ["a@test.com"]
+    assert email.dead_at is not None
+
+
+async def test_deliver_batch_releases_emails_it_cannot_send_within_lease(
+    session: AsyncSession, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    settings = config.settings()
+    monkeypatch.setattr(
+        config,
+        "_settings",
+        settings.model_copy(
+            update={"OUTBOX_LEASE_SECONDS": settings.outbox_send_max_seconds + 0.05}
+        ),
+    )
+    sent: list[str] = []
+
+    async def send_email(_: emails.EmailData, email_to: str) -> None:
+        await asyncio.sleep(0.1)
+        sent.append(email_to)
+
+    monkeypatch.setattr(emails, "send_email", send_email)
+    for email_to in ("a@test.com", "b@test.com"):
+        outbox.enqueue(
+            session, emails.EmailData(html_content="<p>Hi</p>", subject="Hi"), email_to
+        )
+
+    assert await outbox.deliver_batch() == 2
+    assert len(sent) == 1
+
+    # Released unattempted, and due again straight away
+    email = await session.scalar(sql.select(outbox.OutboxEmail))
+    assert email is not None
+    await session.refresh(email)
+    assert email.email_to != sent[0]
+    assert email.attempts == 0
+    assert email.dead_at is None
+    assert await outbox.deliver_batch() == 1
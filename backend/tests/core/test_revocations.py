@@ -0,0 +1,27 @@
+import uuid
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import revocations, users
+
+
+async def test_revoke_user_applies_on_commit(
+    session: AsyncSession, user: users.User
+) -> None:
+    await session.flush()
+    claims = {"sub": str(user.id), "iat": 0}
+
+    await revocations.revoke_user(session, user.id)
+    assert not revocations.is_revoked(claims)
+
+    await session.commit()
+    assert revocations.is_revoked(claims)
+
+
+async def test_revoke_token_discarded_on_rollback(session: AsyncSession) -> None:
+    jti = uuid.uuid4().hex
+
+    await revocations.revoke_token(session, jti, 4102444800)
+    await session.rollback()
+
+    assert not revocations.is_revoked({"sub": str(uuid.uuid4()), "jti": jti})
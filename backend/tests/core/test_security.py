@@ -0,0 +1,59 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.core import config, security
+from app.core.exceptions import Overloaded
+
+
+async def test_hash_password_async() -> None:
+    hashed = await security.hash_password_async("My Password")
+
+    assert await security.verify_password_async("My Password", hashed)
+    assert not await security.verify_password_async("Not My Password", hashed)
+
+
+async def test_hashing_pool_rejects_when_saturated(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    settings = config.settings()
+    capacity = settings.PASSWORD_HASHING_WORKERS + settings.PASSWORD_HASHING_MAX_QUEUE
+    monkeypatch.setattr(security._hashing_counters, "pending", capacity)
+    rejected = security.hashing_pool_stats().rejected
+
+    with pytest.raises(Overloaded):
+        await security.hash_password_async("My Password")
+
+    assert security.hashing_pool_stats().rejected == rejected + 1
+
+
+async def test_hashing_job_holds_its_slot_until_done() -> None:
+    pending = security._hashing_counters.pending
+    completed = security.hashing_pool_stats().completed
+    finish = threading.Event()
+
+    try:
+        # The caller gives up, as when a client disconnects, but the job runs on
+        job = asyncio.create_task(security._run_hashing(finish.wait))
+        await asyncio.sleep(0.05)
+        job.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await job
+        assert security._hashing_counters.pending == pending + 1
+    finally:
+        finish.set()
+
+    while security._hashing_counters.pending > pending:
+        await asyncio.sleep(0.01)
+    assert security.hashing_pool_stats().completed == completed + 1
+
+
+async def test_hashing_pool_counts_only_successful_jobs() -> None:
+    completed = security.hashing_pool_stats().completed
+
+    with pytest.raises(ValueError):
+        await security.verify_password_async("My Password", "not a hash")
+
+    await asyncio.sleep(0.05)
+    assert security.hashing_pool_stats().completed == completed
@@ -0,0 +1,41 @@
+import pytest
+
+from app.core import throttling
+from app.core.exceptions import RateLimited
+
+
+def test_sliding_window_limiter() -> None:
+    limiter = throttling.SlidingWindowLimiter(limit=3, window=3600, max_keys=10)
+
+    for _ in range(3):
+        limiter.acquire("test@test.com")
+
+    with pytest.raises(RateLimited) as e:
+        limiter.acquire("test@test.com")
+
+    assert 0 < e.value.retry_after <= 3600
+    limiter.acquire("other@test.com")
+
+
+def test_sliding_window_limiter_evicts_least_recent_keys() -> None:
+    limiter = throttling.SlidingWindowLimiter(limit=1, window=3600, max_keys=2)
+    limiter.acquire("a")
+    limiter.acquire("b")
+    limiter.acquire("c")
+
+    # "a" was evicted, so its attempt was forgotten
+    limiter.acquire("a")
+    with pytest.raises(RateLimited):
+        limiter.acquire("c")
+
+
+def test_concurrency_limiter() -> None:
+    limiter = throttling.ConcurrencyLimiter(limit=1)
+
+    with limiter.acquire():
+        with pytest.raises(RateLimited):
+            with limiter.acquire():
+                pass
+
+    with limiter.acquire():
+        assert limiter.in_flight == 1
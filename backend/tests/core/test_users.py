@@ -0,0 +1,146 @@
+import asyncio
+from typing import Any
+
+import pytest
+import sqlalchemy as sql
+from passlib.hash import bcrypt
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import config, security, users
+from app.core.exceptions import DoesNotExist
+
+
+async def test_get_from_token_caches_principal(
+    session: AsyncSession, user: users.User, user_token: str
+) -> None:
+    misses = users.principal_cache_stats().misses
+    hits = users.principal_cache_stats().hits
+
+    first = await users.get_from_token(session, user_token)
+    second = await users.get_from_token(session, user_token)
+
+    assert first.id == second.id == user.id
+    assert users.principal_cache_stats().misses == misses + 1
+    assert users.principal_cache_stats().hits == hits + 1
+
+
+async def test_delete_invalidates_cached_principal(
+    session: AsyncSession, admin_user: users.User, user: users.User, user_token: str
+) -> None:
+    await users.get_from_token(session, user_token)
+    await users.delete(session, admin_user, user.id)
+    misses = users.principal_cache_stats().misses
+
+    with pytest.raises(DoesNotExist):
+        await users.get_from_token(session, user_token)
+
+    assert users.principal_cache_stats().misses == misses + 1
+
+
+async def test_create_many_reports_duplicates(
+    session: AsyncSession, admin_user: users.User, user: users.User
+) -> None:
+    new_users = [
+        {"email": "first@bulk.test", "name": "First", "password": "password1"},
+        {"email": user.email, "name": "Taken", "password": "password2"},
+        {"email": "first@bulk.test", "name": "Again", "password": "password3"},
+        {"email": "second@bulk.test", "name": "Second", "password": "password4"},
+    ]
+
+    results = await users.create_many(session, admin_user, new_users)
+
+    assert [result.status for result in results] == [
+        "created",
+        "duplicate",
+        "duplicate",
+        "created",
+    ]
+    created = await session.get(users.User, results[0].id)
+    assert created is not None
+    assert created.name == "First"
+    assert security.verify_password("password1", created.hashed_password)
+
+
+async def test_concurrent_get_one_shares_query(
+    session: AsyncSession, admin_user: users.User, user: users.User
+) -> None:
+    await session.flush()
+    statements: list[str] = []
+
+    def record(*args: Any) -> None:
+        statements.append(args[2])
+
+    connection = (await session.connection()).sync_connection
+    sql.event.listen(connection, "before_cursor_execute", record)
+    try:
+        found = await asyncio.gather(
+            *(users.get_one(session, admin_user, user.id) for _ in range(10))
+        )
+    finally:
+        sql.event.remove(connection, "before_cursor_execute", record)
+
+    assert all(each is not None and each.id == user.id for each in found)
+    assert len(statements) == 1
+
+
+async def explain(session: AsyncSession, statement: sql.Select[Any]) -> str:
+    # Tables this small would otherwise be read sequentially
+    await session.execute(sql.text("SET LOCAL enable_seqscan = off"))
+    await session.execute(sql.text("SET LOCAL enable_bitmapscan = off"))
+    compiled = statement.compile(
+        dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+    )
+    return "\n".join(await session.scalars(sql.text(f"EXPLAIN {compiled}")))
+
+
+@pytest.mark.usefixtures("user")
+async def test_login_lookup_is_index_only(session: AsyncSession) -> None:
+    plan = await explain(session, users._credentials("Test@Test.com"))
+
+    assert "Index Only Scan using ix_users_lower_email" in plan
+
+
+@pytest.mark.usefixtures("user")
+async def test_password_reset_lookup_uses_lower_email_index(
+    session: AsyncSession,
+) -> None:
+    plan = await explain(
+        session,
+        sql.select(users.User.email).where(users._email_matches("TEST@test.com")),
+    )
+
+    assert "ix_users_lower_email" in plan
+
+
+async def test_create_token_ignores_email_case(session: AsyncSession) -> None:
+    session.add(
+        users.User(
+            name="Mixed Case",
+            email="Mixed.Case@Test.com",
+            hashed_password=security.hash_password("password"),
+        )
+    )
+    await session.flush()
+
+    tokens = await users.create_token(session, "mixed.case@test.COM", "password")
+
+    assert tokens.access_token
+
+
+async def test_create_token_rehashes_outdated_password(
+    session: AsyncSession, user: users.User
+) -> None:
+    rounds = config.settings().BCRYPT_ROUNDS
+    outdated = bcrypt.using(rounds=rounds - 1).hash("My Password")
+    user.hashed_password = outdated
+    await session.flush()
+
+    await users.create_token(session, user.email, "My Password")
+
+    hashed_password = await session.scalar(
+        sql.select(users.User.hashed_password).where(users.User.id == user.id)
+    )
+    assert hashed_password != outdated
+    assert bcrypt.from_string(hashed_password).rounds == rounds
+    assert security.verify_password("My Password", hashed_password)
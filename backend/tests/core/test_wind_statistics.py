@@ -0,0 +1,121 @@
+import datetime
+
+import numpy as np
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import sessions, users, wind_statistics
+
+
+def test_summarize() -> None:
+    groups = [
+        wind_statistics.ObservationGroup(
+            "Brouwersdam", "windsurfing", "wellpowered", 3
+        ),
+        wind_statistics.ObservationGroup(
+            "Brouwersdam", "wingfoiling", "overpowered", 1
+        ),
+        wind_statistics.ObservationGroup("Workum", "windsurfing", "wellpowered", 2),
+    ]
+
+    summary = wind_statistics.summarize(
+        groups,
+        np.array([10, 20, np.nan, 30, 16, np.nan]),
+        np.array([15, 24, 30, np.nan, 20, np.nan]),
+        np.array([80, 100, -1, 90, -1, -1]),
+    )
+
+    overall = summary.overall
+    assert overall.observations == 6
+    assert overall.mean_speed_kts == pytest.approx(19)
+    assert overall.max_speed_kts == 30
+    assert overall.max_gust_kts == 30
+    assert overall.gust_factor == pytest.approx((1.5 + 1.2 + 1.25) / 3)
+    assert overall.mean_direction_degrees == pytest.approx(90)
+    assert overall.hours_by_power_level == {
+        "windsurfing": {"wellpowered": 5},
+        "wingfoiling": {"overpowered": 1},
+    }
+
+    brouwersdam = summary.locations["Brouwersdam"]
+    assert brouwersdam.observations == 4
+    assert brouwersdam.mean_speed_kts == pytest.approx(20)
+    assert brouwersdam.direction_variance == pytest.approx(
+        1 - (2 * np.cos(np.deg2rad(10)) + 1) / 3
+    )
+
+    # Readings that are missing throughout are reported as missing
+    workum = summary.locations["Workum"]
+    assert workum.max_speed_kts == 16
+    assert workum.mean_direction_degrees is None
+    assert workum.direction_variance is None
+
+
+def test_summarize_nothing() -> None:
+    summary = wind_statistics.summarize([], np.array([]), np.array([]), np.array([]))
+
+    assert summary.overall.observations == 0
+    assert summary.overall.mean_speed_kts is None
+    assert summary.locations == {}
+
+
+async def test_get_summary(
+    session: AsyncSession, admin_user: users.User, user: users.User
+) -> None:
+    await session.flush()
+
+    def new_session(
+        location: str, observations: list[dict[str, float | None]]
+    ) -> dict[str, object]:
+        return {
+            "date": datetime.date(2026, 6, 1),
+            "start_time": datetime.time(13),
+            "end_time": datetime.time(16),
+            "location": location,
+            "sport": "windsurfing",
+            "equipment": "5.3 sail",
+            "power_level": "wellpowered",
+            "observations": observations,
+        }
+
+    await sessions.create_many(
+        session,
+        user,
+        [
+            new_session(
+                "Workum",
+                [
+                    {
+                        "average_speed_kts": 18,
+                        "gust_speed_kts": 27,
+                        "direction_degrees": 270,
+                    },
+                    {"average_speed_kts": None, "gust_speed_kts": None},
+                ],
+            ),
+            new_session(
+                "Brouwersdam",
+                [
+                    {
+                        "average_speed_kts": 12.5,
+                        "gust_speed_kts": 15,
+                        "direction_degrees": 90,
+                    }
+                ],
+            ),
+        ],
+    )
+    await sessions.create_many(
+        session,
+        admin_user,
+        [new_session("Workum", [{"average_speed_kts": 40, "gust_speed_kts": 50}])],
+    )
+
+    summary = await wind_statistics.get_summary(session, user)
+
+    assert summary.overall.observations == 3
+    assert summary.overall.max_speed_kts == 18
+    assert list(summary.locations) == ["Brouwersdam", "Workum"]
+    assert summary.locations["Workum"].gust_factor == pytest.approx(1.5)
+    assert summary.locations["Workum"].mean_direction_degrees == pytest.approx(270)
+    assert summary.locations["Brouwersdam"].mean_speed_kts == pytest.approx(12.5)